@@ -0,0 +1,145 @@
+"""
+回答缓存模块
+"""
+
+import re
+import logging
+import unicodedata
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from lru_cache import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+# 归一化时去掉空白和中英文标点，"HashMap 和 ConcurrentHashMap 的区别？" 与 "hashmap和concurrenthashmap的区别" 视为同一问题
+_IGNORED_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_question(question: str) -> str:
+    """
+    问题归一化 - 全角转半角、转小写、去掉空白和标点
+
+    Args:
+        question: 原始问题
+
+    Returns:
+        归一化后的问题
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    return _IGNORED_PATTERN.sub("", text)
+
+
+class AnswerCache:
+    """回答缓存 - 按归一化问题精确匹配，可选地在未命中时按问题向量的余弦相似度查找近似问题"""
+
+    def __init__(self, embed_function: Optional[Callable[[str], List[float]]] = None, max_size: int = 1024,
+                 ttl: Optional[float] = 86400, similarity_threshold: float = 1.0):
+        """
+        初始化回答缓存
+
+        Args:
+            embed_function: 问题向量化函数，为None时只做精确匹配
+            max_size: 最大缓存条目数
+            ttl: 条目存活秒数，为None或<=0时不过期
+            similarity_threshold: 近似匹配的余弦相似度阈值，>=1时只做精确匹配(默认)；
+                只差一个词的技术问题(如 Java 21 与 Java 17)相似度常高于0.95，开启近似匹配会返回错误的回答
+        """
+        self.embed_function = embed_function
+        self.similarity_threshold = similarity_threshold
+        self.version: Optional[str] = None
+        self.semantic_hits = 0
+        # 键为归一化问题，值为 (回答, 单位化的问题向量或None)
+        self._cache = TTLLRUCache(max_size=max_size, ttl=ttl)
+
+    @property
+    def uses_embeddings(self) -> bool:
+        """是否需要问题向量(近似匹配)"""
+        return self.embed_function is not None and self.similarity_threshold < 1
+
+    def check_version(self, version: Optional[str]):
+        """
+        索引版本变化时清空缓存，避免返回基于旧文档生成的回答
+
+        Args:
+            version: 当前索引版本
+        """
+        if version != self.version:
+            if len(self._cache):
+                logger.info("索引版本已变化，清空回答缓存")
+            self._cache.clear()
+            self.version = version
+
+    def get(self, question: str) -> Optional[str]:
+        """
+        查找缓存的回答
+
+        Args:
+            question: 用户问题
+
+        Returns:
+            缓存的回答，未命中时返回None
+        """
+        key = normalize_question(question)
+        item = self._cache.get(key)
+        if item is not None:
+            logger.info(f"回答缓存精确命中: {question[:50]}")
+            return item[0]
+
+        if not self.uses_embeddings:
+            return None
+        entries = [(cached_key, value) for cached_key, value in self._cache.items() if value[1] is not None]
+        if not entries:
+            return None
+
+        vector = self._unit_vector(question)
+        similarities = np.stack([value[1] for _, value in entries]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+
+        # 通过get刷新该条目的LRU位置
+        cached_key = entries[best][0]
+        item = self._cache.get(cached_key)
+        if item is None:
+            return None
+        self.semantic_hits += 1
+        logger.info(f"回答缓存近似命中(相似度 {similarities[best]:.3f}): {question[:50]}")
+        return item[0]
+
+    def put(self, question: str, answer: str):
+        """
+        缓存回答
+
+        Args:
+            question: 用户问题
+            answer: 生成的回答
+        """
+        vector = None
+        if self.uses_embeddings:
+            vector = self._unit_vector(question)
+        self._cache.put(normalize_question(question), (answer, vector))
+
+    def _unit_vector(self, question: str) -> np.ndarray:
+        """问题向量单位化后用于余弦相似度"""
+        vector = np.asarray(self.embed_function(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        stats = self._cache.get_stats()
+        # 近似命中在内部缓存中记为一次未命中加一次命中，这里换算为按问题计
+        stats['exact_hits'] = stats['hits'] - self.semantic_hits
+        stats['semantic_hits'] = self.semantic_hits
+        stats['misses'] = stats['misses'] - self.semantic_hits
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        stats['similarity_threshold'] = self.similarity_threshold
+        return stats
@@ -0,0 +1,60 @@
+"""
+回答缓存模块测试程序
+测试默认配置下只差版本号的问题不会共用缓存的回答
+"""
+import os
+import sys
+import zlib
+from typing import List
+
+import numpy as np
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from answer_cache import AnswerCache
+
+
+def char_histogram(question: str) -> List[float]:
+    """按字符计数的问题向量，只差一两个字符的问题余弦相似度很高(与真实嵌入模型的表现类似)"""
+    vector = np.zeros(256, dtype=np.float32)
+    for char in question:
+        vector[zlib.crc32(char.encode("utf-8")) % 256] += 1
+    return vector.tolist()
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    a, b = np.asarray(a), np.asarray(b)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+VERSION_PAIRS = [
+    ("Java 21 vs Java 17 新特性", "Java 17 vs Java 11 新特性"),
+    ("MySQL vs PostgreSQL 索引", "MySQL vs PostgreSQL 锁"),
+]
+
+
+def test_version_variants_do_not_share_answers():
+    """默认只做精确匹配，只差版本号/一个词的问题即使向量相似度超过0.95也各自生成回答"""
+    cache = AnswerCache(embed_function=char_histogram)
+    for cached_question, question in VERSION_PAIRS:
+        assert cosine(char_histogram(cached_question), char_histogram(question)) >= 0.95
+        cache.put(cached_question, f"{cached_question} 的回答")
+        assert cache.get(question) is None
+        assert cache.get(cached_question) == f"{cached_question} 的回答"
+
+    assert not cache.uses_embeddings
+    assert cache.get_stats()['semantic_hits'] == 0
+
+
+def test_exact_match_ignores_case_spacing_and_punctuation():
+    """精确匹配仍然忽略大小写、空白和标点"""
+    cache = AnswerCache()
+    cache.put("HashMap 和 ConcurrentHashMap 的区别？", "回答")
+    assert cache.get("hashmap和concurrenthashmap的区别") == "回答"
+
+
+if __name__ == "__main__":
+    test_version_variants_do_not_share_answers()
+    test_exact_match_ignores_case_spacing_and_punctuation()
+    print("✅ 回答缓存模块测试通过")
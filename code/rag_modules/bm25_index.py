@@ -0,0 +1,346 @@
+"""
+BM25索引模块
+"""
+
+import os
+import re
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 英文/代码标识符(如 ConcurrentHashMap、max_connections、utf8)与连续的中日韩文字
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+# 驼峰/数字边界，如 ConcurrentHashMap -> Concurrent Hash Map, HTTP2Server -> HTTP 2 Server
+_CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def whitespace_tokenize(text: str) -> List[str]:
+    """与 BM25Retriever 默认预处理一致的空白分词"""
+    return text.split()
+
+
+def _identifier_tokens(identifier: str) -> List[str]:
+    """标识符本身(小写)加上驼峰/下划线拆分后的子词"""
+    tokens = [identifier.lower()]
+    parts = [part.lower() for piece in identifier.split('_') for part in _CAMEL_PATTERN.findall(piece)]
+    if len(parts) > 1:
+        tokens.extend(parts)
+    return tokens
+
+
+def cjk_bigram_tokenize(text: str) -> List[str]:
+    """
+    中英混合分词 - 中文按字二元组切分，英文/代码标识符保留整体并拆出驼峰子词
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词列表
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        segment = match.group()
+        if _IDENTIFIER_PATTERN.fullmatch(segment):
+            tokens.extend(_identifier_tokens(segment))
+        elif len(segment) == 1:
+            tokens.append(segment)
+        else:
+            tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return tokens
+
+
+def jieba_tokenize(text: str) -> List[str]:
+    """
+    中英混合分词 - 中文使用jieba词典分词(搜索引擎模式)，英文/代码标识符同 cjk_bigram_tokenize
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词列表
+    """
+    import jieba
+
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        segment = match.group()
+        if _IDENTIFIER_PATTERN.fullmatch(segment):
+            tokens.extend(_identifier_tokens(segment))
+        else:
+            tokens.extend(jieba.lcut_for_search(segment))
+    return tokens
+
+
+TOKENIZERS: Dict[str, Callable[[str], List[str]]] = {
+    'cjk_bigram': cjk_bigram_tokenize,
+    'jieba': jieba_tokenize,
+    'whitespace': whitespace_tokenize
+}
+
+
+def resolve_tokenizer_name(name: str) -> str:
+    """
+    获取实际生效的分词器名称 - 配置jieba但未安装时为 cjk_bigram
+
+    Args:
+        name: 配置的分词器名称(cjk_bigram / jieba / whitespace)
+
+    Returns:
+        实际使用的分词器名称
+    """
+    if name not in TOKENIZERS:
+        raise ValueError(f"不支持的分词器: {name}，可选: {', '.join(TOKENIZERS)}")
+    if name == 'jieba':
+        try:
+            import jieba  # noqa: F401
+        except ImportError:
+            logger.warning("未安装jieba，改用 cjk_bigram 分词")
+            return 'cjk_bigram'
+    return name
+
+
+def get_tokenizer(name: str) -> Callable[[str], List[str]]:
+    """
+    按名称获取分词器
+
+    Args:
+        name: 分词器名称(cjk_bigram / jieba / whitespace)
+
+    Returns:
+        分词函数
+    """
+    return TOKENIZERS[resolve_tokenizer_name(name)]
+
+
+class BM25Index:
+    """BM25索引 - 以CSR形式保存倒排表，检索时只对包含查询词的文档做向量化打分"""
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                 tokenizer: str = 'cjk_bigram'):
+        """
+        初始化BM25索引
+
+        Args:
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+            epsilon: 负IDF的下限系数(与rank_bm25的BM25Okapi一致)
+            tokenizer: 分词器名称
+        """
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        # 记录实际生效的分词器，持久化的索引才能在分词器变化(如之后安装了jieba)时失效
+        self.tokenizer_name = resolve_tokenizer_name(tokenizer)
+        self.tokenizer = TOKENIZERS[self.tokenizer_name]
+        self.corpus_version: Optional[str] = None
+        self.chunk_ids: List[str] = []
+        self.vocabulary: Dict[str, int] = {}
+        # 倒排表: 词t的文档位置和词频分别为 posting_docs/posting_tfs[term_offsets[t]:term_offsets[t+1]]
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.posting_docs = np.zeros(0, dtype=np.int32)
+        self.posting_tfs = np.zeros(0, dtype=np.float32)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self._length_norm = np.zeros(0, dtype=np.float32)
+
+    @classmethod
+    def build(cls, texts: List[str], chunk_ids: List[str], corpus_version: Optional[str] = None,
+              **kwargs) -> 'BM25Index':
+        """
+        从文本构建BM25索引
+
+        Args:
+            texts: 按位置排列的文档文本
+            chunk_ids: 与文本一一对应的chunk ID
+            corpus_version: 语料版本(摄取清单摘要)，用于判断持久化索引是否过期
+            **kwargs: 传给构造函数的参数
+
+        Returns:
+            BM25索引
+        """
+        index = cls(**kwargs)
+        index.chunk_ids = list(chunk_ids)
+        index.corpus_version = corpus_version
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        doc_lengths = []
+        for position, text in enumerate(texts):
+            tokens = index.tokenizer(text)
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                docs, freqs = postings.setdefault(term, ([], []))
+                docs.append(position)
+                freqs.append(freq)
+
+        terms = sorted(postings)
+        index.vocabulary = {term: i for i, term in enumerate(terms)}
+        lengths = np.fromiter((len(postings[term][0]) for term in terms), dtype=np.int64, count=len(terms))
+        index.term_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        index.posting_docs = np.fromiter(
+            (doc for term in terms for doc in postings[term][0]), dtype=np.int32, count=int(lengths.sum()))
+        index.posting_tfs = np.fromiter(
+            (freq for term in terms for freq in postings[term][1]), dtype=np.float32, count=int(lengths.sum()))
+        index.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        index._compute_idf()
+        index._compute_length_norm()
+
+        logger.info(f"BM25索引构建完成: {len(doc_lengths)} 个文档, {len(terms)} 个词")
+        return index
+
+    def _compute_idf(self):
+        """计算每个词的IDF，负IDF替换为 epsilon * 平均IDF"""
+        corpus_size = len(self.doc_lengths)
+        doc_freqs = np.diff(self.term_offsets).astype(np.float64)
+        idf = np.log(corpus_size - doc_freqs + 0.5) - np.log(doc_freqs + 0.5)
+        if len(idf):
+            idf[idf < 0] = self.epsilon * idf.mean()
+        self.idf = idf.astype(np.float32)
+
+    def _compute_length_norm(self):
+        """预计算每个文档的长度归一化项 k1 * (1 - b + b * dl / avgdl)"""
+        avgdl = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 1.0
+        self._length_norm = (self.k1 * (1 - self.b + self.b * self.doc_lengths / (avgdl or 1.0))).astype(np.float32)
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        检索 - 只取出查询词的倒排表，用NumPy向量化累加分数
+
+        Args:
+            query: 查询文本
+            k: 返回结果数量
+            allowed: 可选的布尔掩码(长度为文档数)，只返回掩码为True的文档
+
+        Returns:
+            按分数降序的 (文档位置, 分数) 列表
+        """
+        doc_parts, score_parts = [], []
+        for term, query_freq in Counter(self.tokenizer(query)).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.posting_docs[start:end]
+            tfs = self.posting_tfs[start:end]
+            doc_parts.append(docs)
+            score_parts.append(query_freq * self.idf[term_id] * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs]))
+
+        if not doc_parts or k <= 0:
+            return []
+
+        candidate_docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if allowed is not None:
+            keep = allowed[candidate_docs]
+            candidate_docs, scores = candidate_docs[keep], scores[keep]
+            if not len(candidate_docs):
+                return []
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(candidate_docs[i]), float(scores[i])) for i in top]
+
+    def get_vocabulary(self, min_doc_freq: int = 1, max_doc_freq: Optional[int] = None) -> List[str]:
+        """
+        获取词表
+
+        Args:
+            min_doc_freq: 最小文档频率
+            max_doc_freq: 最大文档频率，为None时不限制
+
+        Returns:
+            词列表
+        """
+        doc_freqs = np.diff(self.term_offsets)
+        return [
+            term for term, term_id in self.vocabulary.items()
+            if doc_freqs[term_id] >= min_doc_freq and (max_doc_freq is None or doc_freqs[term_id] <= max_doc_freq)
+        ]
+
+    def save(self, path: str):
+        """
+        保存索引到npz文件
+
+        Args:
+            path: 文件路径
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            'format_version': self.FORMAT_VERSION,
+            'corpus_version': self.corpus_version,
+            'tokenizer': self.tokenizer_name,
+            'k1': self.k1,
+            'b': self.b,
+            'epsilon': self.epsilon
+        }
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            meta=np.array(json.dumps(meta)),
+            chunk_ids=np.array(self.chunk_ids, dtype=str),
+            vocabulary=np.array(terms, dtype=str),
+            term_offsets=self.term_offsets,
+            posting_docs=self.posting_docs,
+            posting_tfs=self.posting_tfs,
+            doc_lengths=self.doc_lengths,
+            idf=self.idf
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"BM25索引已保存到: {path}")
+
+    @classmethod
+    def load(cls, path: str, corpus_version: Optional[str], chunk_ids: List[str],
+             tokenizer: str = 'cjk_bigram') -> Optional['BM25Index']:
+        """
+        从npz文件加载索引，格式、分词器、语料版本或chunk列表不一致时视为过期
+
+        Args:
+            path: 文件路径
+            corpus_version: 当前语料版本
+            chunk_ids: 当前按位置排列的chunk ID
+            tokenizer: 当前配置的分词器名称
+
+        Returns:
+            BM25索引，不存在或已过期时返回None
+        """
+        if not Path(path).exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if (meta.get('format_version') != cls.FORMAT_VERSION
+                        or meta.get('tokenizer') != resolve_tokenizer_name(tokenizer)
+                        or meta.get('corpus_version') != corpus_version
+                        or data['chunk_ids'].tolist() != list(chunk_ids)):
+                    logger.info("BM25索引已过期，将重新构建")
+                    return None
+
+                index = cls(k1=meta['k1'], b=meta['b'], epsilon=meta['epsilon'], tokenizer=tokenizer)
+                index.corpus_version = meta['corpus_version']
+                index.chunk_ids = list(chunk_ids)
+                index.vocabulary = {term: i for i, term in enumerate(data['vocabulary'].tolist())}
+                index.term_offsets = data['term_offsets']
+                index.posting_docs = data['posting_docs']
+                index.posting_tfs = data['posting_tfs']
+                index.doc_lengths = data['doc_lengths']
+                index.idf = data['idf']
+        except Exception as e:
+            logger.warning(f"读取BM25索引失败: {e}")
+            return None
+
+        index._compute_length_norm()
+        logger.info(f"BM25索引已从 {path} 加载")
+        return index
@@ -5,7 +5,7 @@
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 @dataclass
 class RAGConfig:
@@ -18,19 +18,86 @@ class RAGConfig:
     # 模型配置
     embedding_model: str = "BAAI/bge-small-zh-v1.5"  # 中文嵌入模型
     llm_model: str = "kimi-k2-0711-preview"          # Kimi大语言模型
+    embedding_batch_size: int = 32    # 每批嵌入的chunk数量(按token长度分桶)
+    embedding_threads: int = 0        # 嵌入使用的CPU线程数(0为torch默认值)
+    enable_embedding_cache: bool = True # 是否启用持久化嵌入缓存(重建索引时复用未变化chunk的向量)
+
+    # 向量索引配置
+    index_type: str = "flat"          # FAISS索引类型: flat / hnsw / ivf / ivfpq
+    hnsw_m: int = 32                  # HNSW每个节点的邻居数
+    hnsw_ef_construction: int = 200   # HNSW构建时的搜索宽度
+    hnsw_ef_search: int = 64          # HNSW搜索时的搜索宽度
+    ivf_nlist: int = 1024             # IVF聚类中心数(按训练样本量自动收缩)
+    ivf_nprobe: int = 16              # IVF搜索时探查的聚类数
+    pq_m: int = 16                    # IVF-PQ的子空间数
+    pq_nbits: int = 8                 # IVF-PQ每个子空间的编码位数
+    index_train_size: int = 100000    # 索引训练采样的向量数
+    index_mmap: bool = True           # 加载索引时是否使用内存映射(多进程共享页缓存)
     
     # 检索配置
     top_k: int = 5                    # 检索返回的文档数量
     chunk_size: int = 1000            # 文档分块大小
     chunk_overlap: int = 200          # 分块重叠大小
+    query_cache_size: int = 1024      # 查询向量LRU缓存的最大条目数
+    query_cache_ttl: float = 3600     # 查询向量缓存的存活秒数(<=0为不过期)
+    bm25_tokenizer: str = "cjk_bigram" # BM25分词器: cjk_bigram / jieba / whitespace
+    vector_candidate_factor: int = 4  # 向量检索候选深度 = top_k * 倍数
+    bm25_candidate_factor: int = 4    # BM25检索候选深度 = top_k * 倍数
+    min_candidate_k: int = 20         # 每路检索的最小候选深度
+    max_candidate_k: int = 200        # 每路检索的最大候选深度
+    filter_candidate_factor: int = 5  # 带元数据过滤时候选深度的额外倍数
+    prefilter_bruteforce_limit: int = 2048 # 预过滤后候选不超过该数量时直接对其向量精确计算距离
+    parallel_hybrid: bool = True      # 混合检索时向量检索和BM25检索是否并发执行
+    retriever_timeout: float = 5.0    # 并发检索时单路检索的超时秒数，从该路开始执行时计时，超时的一路被丢弃(<=0为不超时)
+    retrieval_workers: int = 0        # 并发检索线程池大小(<=0为 2 × batch_max_concurrency，覆盖并发查询的两路检索)
+    fusion_strategy: str = "rrf"      # 混合检索融合策略: rrf / weighted_sum / combmnz
+    vector_weight: float = 1.0        # 向量检索结果的融合权重
+    bm25_weight: float = 1.0          # BM25检索结果的融合权重
+    rrf_k: int = 60                   # RRF平滑参数
+    enable_rerank: bool = False       # 是否用交叉编码器对融合结果重排序(需要sentence_transformers)
+    rerank_model: str = "BAAI/bge-reranker-base" # 重排序模型
+    rerank_batch_size: int = 16       # 重排序每批打分的 (查询, 文档) 对数量
+    rerank_max_length: int = 512      # 重排序时查询与文档拼接后的最大token数
+    rerank_latency_budget_ms: float = 300 # 单次查询重排序的延迟预算(毫秒)，决定候选池大小
+    rerank_min_candidates: int = 10   # 重排序候选池的最小大小
+    rerank_max_candidates: int = 50   # 重排序候选池的最大大小
+    rerank_min_score: Optional[float] = None # 重排序分数低于该值的文档不传给生成(None为不过滤)
+    rerank_cache_size: int = 8192     # (查询, chunk) 重排序分数缓存的最大条目数
+    enable_diversity: bool = True     # 是否对检索结果做多样化选择(SimHash近似重复过滤 + MMR)
+    diversity_candidate_factor: int = 3 # 多样化选择的候选数 = top_k * 倍数
+    mmr_lambda: float = 0.7           # MMR中相关度的权重(1为只看相关度)
+    simhash_max_distance: int = 3     # SimHash汉明距离不超过该值的chunk视为近似重复
+    workers: int = 1                  # 文档读取和分块的并行进程数(1为单进程，<=0为全部CPU核)
+    streaming_ingest: bool = False    # 是否流式构建索引(文件→chunk→嵌入批次→索引追加)
+    ingest_batch_size: int = 256      # 流式构建时每批嵌入的chunk数量
+    parent_cache_size: int = 128      # 常驻内存的父文档正文数量上限(其余按需从源文件读取)
+    enable_dedup: bool = True         # 构建索引前是否合并重复chunk(重复内容只嵌入和索引一次)
+    dedup_near_duplicates: bool = False # 是否用MinHash-LSH合并近似重复(可能误合并仅版本号不同的chunk，默认只做精确去重)
+    dedup_threshold: float = 0.9      # 视为近似重复的Jaccard相似度下限
+    dedup_num_perm: int = 128         # MinHash签名长度
+    dedup_bands: int = 32             # LSH分段数(需整除签名长度)
+    dedup_min_length: int = 50        # 短于该字符数的chunk只做精确去重
     
     # 生成配置
     temperature: float = 0.1          # 生成温度，控制随机性
     max_tokens: int = 2048            # 最大生成token数
+    context_max_tokens: int = 3000    # 回答提示词中检索上下文的token预算
+    batch_max_concurrency: int = 8    # 批量问答时并发的LLM请求数
+    enable_answer_cache: bool = True  # 是否缓存回答(相同或近似的问题跳过检索和生成)
+    answer_cache_size: int = 1024     # 回答缓存的最大条目数
+    answer_cache_ttl: float = 86400   # 回答缓存的存活秒数(<=0为不过期)
+    answer_cache_similarity: float = 1.0 # 近似问题命中缓存的余弦相似度阈值(>=1为只做精确匹配；只差版本号等一个词的问题相似度也很高，慎用)
     
     # 系统配置
     log_level: str = "INFO"           # 日志级别
     enable_query_rewrite: bool = True # 是否启用查询重写
+    enable_rewrite_classifier: bool = True # 是否用本地规则跳过已足够具体的查询的重写
+    rewrite_min_length: int = 6       # 短于该字符数的查询总是交给LLM判断是否重写
+    rewrite_max_term_df: float = 0.05 # 文档频率占比不超过该值的词才视为有区分度的技术词(用于跳过重写)
+    rewrite_cache_size: int = 1024    # 查询重写结果缓存的最大条目数
+    rewrite_cache_ttl: float = 86400  # 查询重写结果缓存的存活秒数(<=0为不过期)
+    speculative_retrieval: bool = True # 查询重写的同时先用原问题检索，重写结果不变时直接复用
+    speculative_merge: bool = True    # 查询被重写时，是否将重写前后两次检索结果融合
 
     def __post_init__(self):
         """初始化后的处理"""
@@ -45,6 +112,19 @@ class RAGConfig:
         # 创建索引保存目录
         Path(self.index_save_path).mkdir(parents=True, exist_ok=True)
     
+    def get_index_options(self) -> Dict[str, Any]:
+        """获取向量索引的构建和搜索参数"""
+        return {
+            'hnsw_m': self.hnsw_m,
+            'hnsw_ef_construction': self.hnsw_ef_construction,
+            'hnsw_ef_search': self.hnsw_ef_search,
+            'ivf_nlist': self.ivf_nlist,
+            'ivf_nprobe': self.ivf_nprobe,
+            'pq_m': self.pq_m,
+            'pq_nbits': self.pq_nbits,
+            'train_size': self.index_train_size
+        }
+
     @classmethod
     def from_dict(cls, config_dict: Dict[str, Any]) -> 'RAGConfig':
         """从字典创建配置对象"""
@@ -57,13 +137,78 @@ class RAGConfig:
             'index_save_path': self.index_save_path,
             'embedding_model': self.embedding_model,
             'llm_model': self.llm_model,
+            'embedding_batch_size': self.embedding_batch_size,
+            'embedding_threads': self.embedding_threads,
+            'enable_embedding_cache': self.enable_embedding_cache,
+            'index_type': self.index_type,
+            'hnsw_m': self.hnsw_m,
+            'hnsw_ef_construction': self.hnsw_ef_construction,
+            'hnsw_ef_search': self.hnsw_ef_search,
+            'ivf_nlist': self.ivf_nlist,
+            'ivf_nprobe': self.ivf_nprobe,
+            'pq_m': self.pq_m,
+            'pq_nbits': self.pq_nbits,
+            'index_train_size': self.index_train_size,
+            'index_mmap': self.index_mmap,
             'top_k': self.top_k,
             'chunk_size': self.chunk_size,
             'chunk_overlap': self.chunk_overlap,
+            'query_cache_size': self.query_cache_size,
+            'query_cache_ttl': self.query_cache_ttl,
+            'bm25_tokenizer': self.bm25_tokenizer,
+            'vector_candidate_factor': self.vector_candidate_factor,
+            'bm25_candidate_factor': self.bm25_candidate_factor,
+            'min_candidate_k': self.min_candidate_k,
+            'max_candidate_k': self.max_candidate_k,
+            'filter_candidate_factor': self.filter_candidate_factor,
+            'prefilter_bruteforce_limit': self.prefilter_bruteforce_limit,
+            'parallel_hybrid': self.parallel_hybrid,
+            'retriever_timeout': self.retriever_timeout,
+            'retrieval_workers': self.retrieval_workers,
+            'fusion_strategy': self.fusion_strategy,
+            'vector_weight': self.vector_weight,
+            'bm25_weight': self.bm25_weight,
+            'rrf_k': self.rrf_k,
+            'enable_rerank': self.enable_rerank,
+            'rerank_model': self.rerank_model,
+            'rerank_batch_size': self.rerank_batch_size,
+            'rerank_max_length': self.rerank_max_length,
+            'rerank_latency_budget_ms': self.rerank_latency_budget_ms,
+            'rerank_min_candidates': self.rerank_min_candidates,
+            'rerank_max_candidates': self.rerank_max_candidates,
+            'rerank_min_score': self.rerank_min_score,
+            'rerank_cache_size': self.rerank_cache_size,
+            'enable_diversity': self.enable_diversity,
+            'diversity_candidate_factor': self.diversity_candidate_factor,
+            'mmr_lambda': self.mmr_lambda,
+            'simhash_max_distance': self.simhash_max_distance,
+            'workers': self.workers,
+            'streaming_ingest': self.streaming_ingest,
+            'ingest_batch_size': self.ingest_batch_size,
+            'parent_cache_size': self.parent_cache_size,
+            'enable_dedup': self.enable_dedup,
+            'dedup_near_duplicates': self.dedup_near_duplicates,
+            'dedup_threshold': self.dedup_threshold,
+            'dedup_num_perm': self.dedup_num_perm,
+            'dedup_bands': self.dedup_bands,
+            'dedup_min_length': self.dedup_min_length,
             'temperature': self.temperature,
             'max_tokens': self.max_tokens,
+            'context_max_tokens': self.context_max_tokens,
+            'batch_max_concurrency': self.batch_max_concurrency,
+            'enable_answer_cache': self.enable_answer_cache,
+            'answer_cache_size': self.answer_cache_size,
+            'answer_cache_ttl': self.answer_cache_ttl,
+            'answer_cache_similarity': self.answer_cache_similarity,
             'log_level': self.log_level,
-            'enable_query_rewrite': self.enable_query_rewrite
+            'enable_query_rewrite': self.enable_query_rewrite,
+            'enable_rewrite_classifier': self.enable_rewrite_classifier,
+            'rewrite_min_length': self.rewrite_min_length,
+            'rewrite_max_term_df': self.rewrite_max_term_df,
+            'rewrite_cache_size': self.rewrite_cache_size,
+            'rewrite_cache_ttl': self.rewrite_cache_ttl,
+            'speculative_retrieval': self.speculative_retrieval,
+            'speculative_merge': self.speculative_merge
         }
 
 # 默认配置实例
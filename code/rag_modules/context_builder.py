@@ -0,0 +1,194 @@
+"""
+上下文构建模块
+"""
+
+import re
+import math
+import logging
+from typing import List, Callable, Optional
+
+from langchain_core.documents import Document
+
+from bm25_index import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+_CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+# 围栏代码块作为不可拆分的整体
+_CODE_BLOCK_PATTERN = re.compile(r"```.*?(?:```|$)", re.S)
+# 句子边界: 中英文句末标点、分号和换行(不按英文句点切分，避免拆开 a.b() 之类的代码)
+_SENTENCE_PATTERN = re.compile(r"[^。！？；!?;\n]*(?:[。！？；!?;]+|\n+|$)")
+_SEPARATOR = "\n" + "=" * 80
+
+
+def heuristic_token_count(text: str) -> int:
+    """没有tiktoken时的token数估算 - 中文约一字一token，其余约四个字符一token"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def get_token_counter(model_name: Optional[str] = None) -> Callable[[str], int]:
+    """
+    获取token计数函数 - 优先使用tiktoken，未安装时退回启发式估算
+
+    Args:
+        model_name: LLM模型名称，tiktoken不认识时使用 cl100k_base 编码
+
+    Returns:
+        token计数函数
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        logger.info("未安装tiktoken，上下文token数使用启发式估算")
+        return heuristic_token_count
+
+    try:
+        encoding = tiktoken.encoding_for_model(model_name) if model_name else tiktoken.get_encoding("cl100k_base")
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def split_segments(text: str) -> List[str]:
+    """
+    将文本切分为句子级片段，代码块保持完整
+
+    Args:
+        text: 文档文本
+
+    Returns:
+        按原顺序排列的片段列表，拼接后等于原文
+    """
+    segments = []
+    position = 0
+    for match in _CODE_BLOCK_PATTERN.finditer(text):
+        segments.extend(_split_sentences(text[position:match.start()]))
+        segments.append(match.group())
+        position = match.end()
+    segments.extend(_split_sentences(text[position:]))
+    return segments
+
+
+def _split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in _SENTENCE_PATTERN.findall(text) if sentence]
+
+
+class ContextBuilder:
+    """上下文构建器 - 按token预算在检索结果间分配额度，超出额度的文档只保留与查询最相关的句子"""
+
+    def __init__(self, max_tokens: int = 3000, model_name: Optional[str] = None, tokenizer: str = "cjk_bigram"):
+        """
+        初始化上下文构建器
+
+        Args:
+            max_tokens: 上下文的token预算
+            model_name: LLM模型名称，用于选择token编码
+            tokenizer: 计算查询相关度时使用的分词器(与BM25一致)
+        """
+        self.max_tokens = max_tokens
+        self.count_tokens = get_token_counter(model_name)
+        self.tokenize = get_tokenizer(tokenizer)
+
+    def build(self, docs: List[Document], query: Optional[str] = None) -> str:
+        """
+        构建上下文字符串 - 按检索排名依次分配剩余预算的平均份额，用不完的额度留给后面的文档
+
+        Args:
+            docs: 按相关度排序的文档列表
+            query: 用户查询，用于挑选相关句子；为None时按原文顺序截取
+
+        Returns:
+            格式化的上下文字符串
+        """
+        if not docs:
+            return "暂无相关技术文档信息。"
+
+        query_terms = set(self.tokenize(query)) if query else set()
+        remaining = self.max_tokens - self.count_tokens(_SEPARATOR)
+        context_parts = []
+        used_tokens = 0
+
+        for i, doc in enumerate(docs, 1):
+            header = self._header(i, doc)
+            share = remaining // (len(docs) - i + 1)
+            body_budget = share - self.count_tokens(header) - 1
+            if body_budget <= 0:
+                continue
+
+            body = self._pack(doc.page_content, query_terms, body_budget)
+            if not body:
+                continue
+
+            doc_text = f"{header}\n{body}\n"
+            doc_tokens = self.count_tokens(doc_text)
+            context_parts.append(doc_text)
+            remaining -= doc_tokens
+            used_tokens += doc_tokens
+
+        logger.info(f"上下文构建完成: {len(context_parts)}/{len(docs)} 个文档, 约 {used_tokens} tokens "
+                    f"(预算 {self.max_tokens})")
+        return _SEPARATOR + "\n".join(context_parts)
+
+    @staticmethod
+    def _header(index: int, doc: Document) -> str:
+        """文档标题行 - 编号、标题、分类和来源文件名"""
+        metadata_info = f"【技术文档 {index}】"
+        if 'title' in doc.metadata:
+            metadata_info += f" {doc.metadata['title']}"
+        if 'category' in doc.metadata:
+            metadata_info += f" | 分类: {doc.metadata['category']}"
+        if 'source' in doc.metadata:
+            # 提取文件名作为来源
+            source_file = re.split(r"[\\/]", doc.metadata['source'])[-1]
+            metadata_info += f" | 来源: {source_file}"
+        return metadata_info
+
+    def _pack(self, text: str, query_terms: set, budget: int) -> str:
+        """
+        在预算内挑选文档片段 - 整篇放得下时原样保留，否则按查询词覆盖度贪心选取句子，代码块只整体取舍
+
+        Args:
+            text: 文档文本
+            query_terms: 查询词集合
+            budget: token预算
+
+        Returns:
+            按原文顺序拼接的片段，不连续处用省略号分隔
+        """
+        if self.count_tokens(text) <= budget:
+            return text
+
+        segments = split_segments(text)
+        costs = [self.count_tokens(segment) for segment in segments]
+        scores = [self._score(segment, query_terms) for segment in segments]
+        # 分数相同时优先保留靠前的片段(标题和开头的定义性描述)
+        order = sorted(range(len(segments)), key=lambda j: (-scores[j], j))
+
+        selected = []
+        used = 0
+        for j in order:
+            # 选中的片段之间可能需要插入省略号
+            cost = costs[j] + 1
+            if used + cost > budget:
+                continue
+            selected.append(j)
+            used += cost
+
+        pieces = []
+        previous = None
+        for j in sorted(selected):
+            if previous is not None and j != previous + 1:
+                pieces.append("\n……\n")
+            pieces.append(segments[j])
+            previous = j
+        return "".join(pieces).strip()
+
+    def _score(self, segment: str, query_terms: set) -> float:
+        """片段与查询的相关度 - 覆盖的查询词数，标题行额外加分"""
+        if not segment.strip():
+            return -1.0
+        score = float(len(query_terms.intersection(self.tokenize(segment)))) if query_terms else 0.0
+        if segment.lstrip().startswith('#'):
+            score += 0.5
+        return score
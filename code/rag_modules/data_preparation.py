@@ -2,18 +2,167 @@
 数据准备模块
 """
 import os
+import json
 import logging
 import hashlib
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Iterator
 
 from langchain_text_splitters import MarkdownHeaderTextSplitter
 from langchain_core.documents import Document
-from pathlib import Path
-import uuid
+
+from parent_store import ParentDocumentStore
 
 logger = logging.getLogger(__name__)
 
+# 定义最小分割单元为三级标题,再小的不单独作为一个chunk,为语义完整性考虑
+# TODO:后续修改标题分割策略,比较一下效果
+HEADERS_TO_SPLIT_ON = [
+    ("#","主标题"),
+    ("##","二级标题"),
+    ("###","三级标题")
+]
+
+
+def make_chunk_id(parent_id: str, header_path: str, chunk_index: int, content_hash: str) -> str:
+    """
+    生成确定性的chunk ID - 相同文档相同内容在任意进程中得到相同ID
+
+    Args:
+        parent_id: 父文档ID
+        header_path: 标题路径(如 "主标题 > 二级标题")
+        chunk_index: chunk在父文档中的位置
+        content_hash: chunk内容哈希
+
+    Returns:
+        chunk ID
+    """
+    key = "\x1f".join([parent_id, header_path, str(chunk_index), content_hash])
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def _assign_chunk_identity(chunk: Document, parent_id: str, chunk_index: int) -> str:
+    """为chunk写入确定性的ID、内容哈希等身份信息，返回chunk ID"""
+    header_path = " > ".join(
+        chunk.metadata[name] for _, name in HEADERS_TO_SPLIT_ON if chunk.metadata.get(name)
+    )
+    content_hash = hashlib.md5(chunk.page_content.encode("utf-8")).hexdigest()
+    chunk_id = make_chunk_id(parent_id, header_path, chunk_index, content_hash)
+    chunk.metadata.update({
+        "chunk_id": chunk_id,
+        "parent_id": parent_id,
+        "doc_type": "child",       # 标记为子文档
+        "chunk_index": chunk_index, # 在父文档中的位置
+        "content_hash": content_hash
+    })
+    return chunk_id
+
+
+# 每个进程复用同一个分割器实例
+_markdown_splitter: Optional[MarkdownHeaderTextSplitter] = None
+
+
+def _get_markdown_splitter() -> MarkdownHeaderTextSplitter:
+    """获取当前进程的Markdown标题分割器"""
+    global _markdown_splitter
+    if _markdown_splitter is None:
+        _markdown_splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=HEADERS_TO_SPLIT_ON,
+            strip_headers=False # 保留标题信息
+        )
+    return _markdown_splitter
+
+
+def _parent_metadata(source: str, parent_id: str) -> Dict[str, Any]:
+    """构建父文档的元数据(来源、ID、分类、标题)，不需要读取文件内容"""
+    doc = Document(
+        page_content="",
+        metadata={
+            'source': source,
+            'parent_id': parent_id,
+            'doc_type': 'parent' # 标记为父文档
+        }
+    )
+    DataPreparationModule._enhance_metadata(doc)
+    return doc.metadata
+
+
+def _load_markdown_file(task: Tuple[str, str]) -> Tuple[str, Optional[Document], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    读取单个Markdown文件并增强元数据(可在子进程中执行)
+
+    Args:
+        task: (文件路径, 相对于知识库根目录的路径)
+
+    Returns:
+        (文件路径, 父文档, 摄取清单记录, 错误信息)
+    """
+    md_file, relative_path = task
+    try:
+        stat = os.stat(md_file)
+        # 直接读取文件内容
+        with open(md_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except Exception as e:
+        return md_file, None, None, str(e)
+
+    # 需要为每个父文档分配确定性的唯一ID
+    parent_id = hashlib.md5(relative_path.encode("utf-8")).hexdigest()
+
+    # 为每个父文档创建Document对象
+    doc = Document(page_content=content, metadata=_parent_metadata(md_file, parent_id))
+
+    entry = {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'hash': hashlib.md5(content.encode("utf-8")).hexdigest(),
+        'parent_id': parent_id
+    }
+    return md_file, doc, entry, None
+
+
+def _split_markdown_document(doc: Document) -> List[Document]:
+    """
+    使用Markdown标题分割器对单个父文档进行结构化分割(可在子进程中执行)
+
+    Args:
+        doc: 父文档
+
+    Returns:
+        按标题结构分割的chunk列表
+    """
+    parent_id = doc.metadata['parent_id']
+    try:
+        # 检查文档内容是否包含Markdown标题
+        content_preview = doc.page_content[:200]
+        has_headers = any(line.strip().startswith('#') for line in content_preview.split('\n'))
+
+        if not has_headers:
+            logger.warning(f"文档 {doc.metadata.get('title', '未知')} 内容中没有发现Markdown标题")
+            logger.debug(f"内容预览: {content_preview}")
+
+        md_chunks = _get_markdown_splitter().split_text(doc.page_content)
+
+        logger.debug(f'文档{doc.metadata.get("title", "未知")} 分割为{len(md_chunks)}个chunk')
+
+        if len(md_chunks) <= 1:
+            logger.warning(f'文档{doc.metadata.get("title", "未知")}未能正常分块')
+
+        # 为每个子chunks建立与父文档的映射关系(通过metadata)
+        for i,chunk in enumerate(md_chunks):
+            chunk.metadata.update(doc.metadata)
+            _assign_chunk_identity(chunk, parent_id, i)
+        return md_chunks
+
+    except Exception as e:
+        logger.warning(f"文档 {doc.metadata.get('source', '未知')} Markdown分割失败: {e}")
+        # 如果Markdown分割失败，将整个文档作为一个chunk(复制一份，避免把父文档改成子文档)
+        chunk = Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+        _assign_chunk_identity(chunk, parent_id, 0)
+        return [chunk]
+
 class DataPreparationModule:
     """数据准备模块 - 负责数据加载、清洗和预处理"""
     # 统一维护的分类与难度配置，供外部复用，避免关键词重复定义
@@ -69,18 +218,33 @@ class DataPreparationModule:
 
     }
     CATEGORY_LABELS = list(set(CATEGORY_MAPPING.values()))
+    MANIFEST_FILENAME = "ingest_manifest.json"
 
-    def __call__(self,data_path: str):
+    def __call__(self,data_path: str, manifest_path: Optional[str] = None, workers: int = 1,
+                 parent_cache_size: int = 128):
         """
         初始化数据准备模块
         
         Args:
             data_path: 数据文件夹路径
+            manifest_path: 摄取清单文件路径，为None时不启用增量摄取
+            workers: 文件读取和分块的并行进程数，1为单进程，<=0时使用全部CPU核
+            parent_cache_size: 父文档存储中常驻内存的父文档正文数量上限
         """
         self.data_path = data_path
+        self.manifest_path = manifest_path
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
         self.documents: List[Document] = [] # 父文档(完整技术博客)
         self.chunks: List[Document] = [] # 子文档(按照标题分割后的文本块)
         self.parent_child_map: Dict[str, str] = {} # 父子文档映射关系
+        # 摄取清单: 相对路径 -> {mtime, size, hash, parent_id}
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        # 增量摄取时需要从索引中移除旧chunk的父文档ID(修改和删除的文件)
+        self.stale_parent_ids: List[str] = []
+        # 最近一次增量扫描中内容未变、但mtime/size变化的文件数(只需更新摄取清单)
+        self.touched_files = 0
+        # 全部父文档(含增量加载时未变化的文档)的元数据，正文按需读取
+        self.parent_store = ParentDocumentStore(cache_size=parent_cache_size)
     
     def load_documents(self) -> List[Document]:
         """
@@ -93,43 +257,290 @@ class DataPreparationModule:
 
         # 直接读取指定目录下的所有Markdown文件
         documents = []
-        data_path_obj = Path(self.data_path)
-        for md_file in data_path_obj.rglob('*.md'):
+        manifest = {}
+        files = self._scan_markdown_files()
+        tasks = [(str(md_file), relative_path) for relative_path, md_file in files.items()]
+        # 读取文件与增强元数据在进程池中完成，结果按相对路径顺序合并
+        for (_, relative_path), (md_file, doc, entry, error) in zip(tasks, self._parallel_map(_load_markdown_file, tasks)):
+            if error:
+                logger.error(f'加载文件 {md_file} 时出错: {error}')
+                continue
+            documents.append(doc)
+            manifest[relative_path] = entry
+
+        self.documents = documents
+        self.manifest = manifest
+        self.stale_parent_ids = []
+        self._rebuild_parent_store()
+        logger.info(f'成功加载 {len(documents)} 个文档.')
+        return documents
+
+    def load_changed_documents(self) -> List[Document]:
+        """
+        增量加载文档 - 对比摄取清单，只读取新增和修改过的文件
+
+        mtime和size均未变化的文件直接跳过；变化的文件再比较内容哈希，
+        内容未变(如仅被touch)的文件同样跳过。修改和删除文件对应的父文档ID
+        记录在 self.stale_parent_ids 中，供索引模块移除旧chunk。
+
+        Returns:
+            新增和修改的文档列表
+        """
+        logger.info(f'正在增量扫描 {self.data_path} ...')
+
+        old_manifest = self._read_manifest()
+        manifest = {}
+        documents = []
+        stale_parent_ids = []
+        added, modified, touched = 0, 0, 0
+
+        files = self._scan_markdown_files()
+        tasks = []
+        for relative_path, md_file in files.items():
+            old_entry = old_manifest.get(relative_path)
             try:
-                # 直接读取文件内容
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                    # 需要为每个父文档分配确定性的唯一ID
-                    try:
-                        data_root = Path(self.data_path).resolve()
-                        relative_path = Path(md_file).resolve().relative_to(data_root).as_posix()
-                    except Exception:
-                        relative_path = Path(md_file).as_posix()
-                    parent_id = hashlib.md5(relative_path.encode("utf-8")).hexdigest()
-
-                    # 为每个父文档创建Document对象
-                    doc = Document(
-                        page_content=content,
-                        metadata={
-                            'source': str(md_file),
-                            'parent_id': parent_id,
-                            'doc_type': 'parent' # 标记为父文档
-                        }
-                    )
-                    documents.append(doc)
+                stat = md_file.stat()
             except Exception as e:
-                logger.error(f'加载文件 {md_file} 时出错: {e}')
-
-        # 增强文档的元数据
-        for doc in documents:
-            self._enhance_metadata(doc)
+                logger.error(f'读取文件信息 {md_file} 时出错: {e}')
+                stat = None
+            if (old_entry and stat and old_entry.get('mtime') == stat.st_mtime
+                    and old_entry.get('size') == stat.st_size):
+                manifest[relative_path] = old_entry
+                continue
+            tasks.append((str(md_file), relative_path))
+
+        for (_, relative_path), (md_file, doc, entry, error) in zip(tasks, self._parallel_map(_load_markdown_file, tasks)):
+            old_entry = old_manifest.get(relative_path)
+            if error:
+                logger.error(f'加载文件 {md_file} 时出错: {error}')
+                # 读取失败时保留旧记录，避免误删已有索引
+                if old_entry:
+                    manifest[relative_path] = old_entry
+                continue
+
+            manifest[relative_path] = entry
+            if old_entry and old_entry.get('hash') == entry['hash']:
+                # 内容未变(如被touch或git checkout重写)，记录新的mtime/size，下次启动无需再读取和哈希
+                touched += 1
+                continue
+
+            if old_entry:
+                modified += 1
+                stale_parent_ids.append(old_entry['parent_id'])
+            else:
+                added += 1
+            documents.append(doc)
+
+        deleted = [path for path in old_manifest if path not in files]
+        stale_parent_ids.extend(old_manifest[path]['parent_id'] for path in deleted)
 
         self.documents = documents
-        logger.info(f'成功加载 {len(documents)} 个文档.')
+        self.manifest = manifest
+        self.stale_parent_ids = stale_parent_ids
+        self.touched_files = touched
+        self._rebuild_parent_store()
+        logger.info(f'增量扫描完成: 新增 {added} 个, 修改 {modified} 个, 删除 {len(deleted)} 个, '
+                    f'未变化 {len(files) - added - modified} 个文档')
         return documents
-    
-    def _enhance_metadata(self, doc: Document):
+
+    def iter_documents(self, batch_size: int = 64) -> Iterator[Document]:
+        """
+        流式加载文档 - 按批读取文件并逐个产出，不在模块中保留父文档
+
+        摄取清单随迭代逐步更新，迭代结束后可调用 save_manifest 持久化。
+
+        Args:
+            batch_size: 每批读取的文件数
+
+        Yields:
+            父文档
+        """
+        logger.info(f'正在从 {self.data_path} 流式加载文档...')
+
+        files = self._scan_markdown_files()
+        tasks = [(str(md_file), relative_path) for relative_path, md_file in files.items()]
+        self.documents = []
+        self.manifest = {}
+        self.stale_parent_ids = []
+
+        loaded = 0
+        with self._worker_pool() as executor:
+            for start in range(0, len(tasks), batch_size):
+                batch = tasks[start:start + batch_size]
+                for (_, relative_path), (md_file, doc, entry, error) in zip(
+                        batch, self._parallel_map(_load_markdown_file, batch, executor)):
+                    if error:
+                        logger.error(f'加载文件 {md_file} 时出错: {error}')
+                        continue
+                    self.manifest[relative_path] = entry
+                    loaded += 1
+                    yield doc
+
+        self._rebuild_parent_store()
+        logger.info(f'流式加载完成，共 {loaded} 个文档.')
+
+    def _rebuild_parent_store(self):
+        """按摄取清单重建父文档存储 - 只登记元数据，正文在首次访问时读取"""
+        self.parent_store.clear()
+        for relative_path, entry in self.manifest.items():
+            metadata = _parent_metadata(str(Path(self.data_path) / relative_path), entry['parent_id'])
+            metadata['hash'] = entry['hash']
+            self.parent_store.add(entry['parent_id'], metadata)
+
+    def add_parent_documents(self, parent_ids: Iterable[str]) -> List[Document]:
+        """
+        补充加载内容未变化但需要重新分块的父文档(如与变化的文档共享重复chunk的文档)
+
+        Args:
+            parent_ids: 父文档ID列表
+
+        Returns:
+            加载到的父文档列表
+        """
+        documents = self.parent_store.get_many(parent_ids)
+        self.documents.extend(documents)
+        return documents
+
+    def release_documents(self):
+        """分块完成后释放父文档正文，之后通过父文档存储按需读取"""
+        self.documents = []
+
+    def iter_chunks(self, documents: Iterable[Document], batch_size: int = 64) -> Iterator[Document]:
+        """
+        流式分块 - 按批分割上游产出的父文档，不在模块中保留chunk
+
+        Args:
+            documents: 父文档迭代器(通常来自 iter_documents)
+            batch_size: 每批分割的父文档数
+
+        Yields:
+            chunk
+        """
+        total = 0
+        with self._worker_pool() as executor:
+            batch = []
+            for doc in documents:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    for chunk in self._split_batch(batch, executor, total):
+                        total += 1
+                        yield chunk
+                    batch = []
+            if batch:
+                for chunk in self._split_batch(batch, executor, total):
+                    total += 1
+                    yield chunk
+
+        logger.info(f"流式分块完成，共生成 {total} 个结构化块")
+
+    def _split_batch(self, documents: List[Document], executor: Optional[Executor], offset: int) -> List[Document]:
+        """分割一批父文档并补充chunk元数据"""
+        chunks = []
+        for md_chunks in self._parallel_map(_split_markdown_document, documents, executor):
+            chunks.extend(md_chunks)
+        for i, chunk in enumerate(chunks, offset):
+            self.parent_child_map[chunk.metadata['chunk_id']] = chunk.metadata['parent_id']
+            chunk.metadata['batch_index'] = i
+            chunk.metadata['chunk_size'] = len(chunk.page_content)
+        return chunks
+
+    def manifest_digest(self) -> str:
+        """
+        计算当前摄取清单的摘要，作为语料版本号(用于使派生索引失效)
+
+        Returns:
+            摘要字符串
+        """
+        digest = hashlib.md5()
+        for relative_path in sorted(self.manifest):
+            digest.update(f"{relative_path}\0{self.manifest[relative_path]['hash']}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def has_manifest(self) -> bool:
+        """是否存在可用于增量摄取的清单文件"""
+        return bool(self.manifest_path) and Path(self.manifest_path).exists()
+
+    def has_changes(self) -> bool:
+        """最近一次增量扫描是否发现文档变化"""
+        return bool(self.documents or self.stale_parent_ids)
+
+    def has_manifest_updates(self) -> bool:
+        """最近一次增量扫描是否发现仅文件信息(mtime/size)变化、需要保存摄取清单的文件"""
+        return self.touched_files > 0
+
+    def save_manifest(self):
+        """
+        持久化摄取清单 - 应在向量索引保存成功之后调用，保证清单与索引一致
+        """
+        if not self.manifest_path:
+            return
+
+        Path(self.manifest_path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+        logger.info(f"摄取清单已保存到: {self.manifest_path}")
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """读取摄取清单，不存在或损坏时返回空清单"""
+        if not self.has_manifest():
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取摄取清单失败: {e}")
+            return {}
+
+    def _scan_markdown_files(self) -> Dict[str, Path]:
+        """
+        扫描知识库中的Markdown文件
+
+        Returns:
+            按相对路径排序的 {相对路径: 文件路径} 字典
+        """
+        data_root = Path(self.data_path).resolve()
+        files = {}
+        for md_file in Path(self.data_path).rglob('*.md'):
+            try:
+                relative_path = Path(md_file).resolve().relative_to(data_root).as_posix()
+            except Exception:
+                relative_path = Path(md_file).as_posix()
+            files[relative_path] = md_file
+        return dict(sorted(files.items()))
+
+    def _worker_pool(self):
+        """创建可跨多批任务复用的进程池，单进程模式下返回空上下文"""
+        if self.workers <= 1:
+            return nullcontext(None)
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def _parallel_map(self, func: Callable, items: List[Any], executor: Optional[Executor] = None) -> List[Any]:
+        """
+        按输入顺序并行执行任务 - 进程数为1或任务过少时在当前进程内执行
+
+        Args:
+            func: 模块级(可pickle)的任务函数
+            items: 任务参数列表
+            executor: 复用的进程池，为None时临时创建
+
+        Returns:
+            与输入顺序一致的结果列表
+        """
+        workers = min(self.workers, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+
+        # 每个进程一次领取多个任务，减少进程间通信开销
+        chunksize = max(1, len(items) // (workers * 4))
+        if executor is not None:
+            return list(executor.map(func, items, chunksize=chunksize))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items, chunksize=chunksize))
+
+    @classmethod
+    def _enhance_metadata(cls, doc: Document):
         """
         增强文档元数据
         
@@ -141,7 +552,7 @@ class DataPreparationModule:
 
         # 根据目录提取博客分类
         doc.metadata['category'] = '未知分类'
-        for key,value in self.CATEGORY_MAPPING.items():
+        for key,value in cls.CATEGORY_MAPPING.items():
             if key in path_parts:
                 doc.metadata['category'] = value
                 break
@@ -175,8 +586,6 @@ class DataPreparationModule:
 
         # 为每个chunk单独提供元数据
         for i,chunk in enumerate(chunks):
-            if 'chunk_id' not in chunk.metadata:
-                chunk.metadata['chunk_id'] = str(uuid.uuid4())
             chunk.metadata['batch_index'] = i
             chunk.metadata['chunk_size'] = len(chunk.page_content)
 
@@ -191,66 +600,13 @@ class DataPreparationModule:
         Returns:
             按标题结构分割的文档列表
         """
-        # 定义最小分割单元为三级标题,再小的不单独作为一个chunk,为语义完整性考虑
-        # TODO:后续修改标题分割策略,比较一下效果
-        header_to_split_on = [
-            ("#","主标题"),
-            ("##","二级标题"),
-            ("###","三级标题")
-        ]
-
-        markdown_splitter = MarkdownHeaderTextSplitter(
-            headers_to_split_on=header_to_split_on,
-            strip_headers=False # 保留标题信息
-        )
-
         all_chunks = []
 
-        for doc in self.documents:
-            try:
-                # 检查文档内容是否包含Markdown标题
-                content_preview = doc.page_content[:200]
-                has_headers = any(line.strip().startswith('#') for line in content_preview.split('\n'))
-
-                if not has_headers:
-                    logger.warning(f"文档 {doc.metadata.get('dish_name', '未知')} 内容中没有发现Markdown标题")
-                    logger.debug(f"内容预览: {content_preview}")
-                
-                md_chunks = markdown_splitter.split_text(doc.page_content)
-
-                logger.debug(f'文档{doc.metadata.get("title", "未知")} 分割为{len(md_chunks)}个chunk')
-
-                if len(md_chunks) <= 1:
-                    logger.warning(f'文档{doc.metadata.get("title", "未知")}未能正常分块')
-
-                # 为每个子chunks建立与父文档的映射关系(通过metadata)
-                parent_id = doc.metadata['parent_id']
-                for i,chunk in enumerate(md_chunks):
-                    child_id = str(uuid.uuid4())
-
-                    chunk.metadata.update(doc.metadata)
-                    chunk.metadata.update({
-                        "chunk_id": child_id,
-                        "parent_id": parent_id,
-                        "doc_type": "child",  # 标记为子文档
-                        "chunk_index": i      # 在父文档中的位置
-                    })
-
-                    self.parent_child_map[child_id] = parent_id
-
-                all_chunks.extend(md_chunks)
-
-            except Exception as e:
-                logger.warning(f"文档 {doc.metadata.get('source', '未知')} Markdown分割失败: {e}")
-                # 如果Markdown分割失败，将整个文档作为一个chunk
-                child_id = str(uuid.uuid4())
-                doc.metadata.update({
-                    "chunk_id": child_id,
-                    "doc_type": "child",
-                    "chunk_index": 0
-                })
-                self.parent_child_map[child_id] = doc.metadata['parent_id']
-                all_chunks.append(doc)
+        # 各父文档在进程池中独立分割，结果按父文档顺序合并
+        for md_chunks in self._parallel_map(_split_markdown_document, self.documents):
+            for chunk in md_chunks:
+                self.parent_child_map[chunk.metadata['chunk_id']] = chunk.metadata['parent_id']
+            all_chunks.extend(md_chunks)
         
         logger.info(f"Markdown结构分割完成，生成 {len(all_chunks)} 个结构化块")
         return all_chunks
@@ -265,7 +621,7 @@ class DataPreparationModule:
         Returns:
             过滤后的文档列表
         """
-        return [doc for doc in self.documents if doc.metadata.get('category') == category]
+        return self.parent_store.get_many(self.parent_store.parent_ids_by_category(category))
 
     def get_statistics(self) -> Dict[str, Any]:
         """
@@ -274,20 +630,14 @@ class DataPreparationModule:
         Returns:
             统计信息字典
         """
-        if not self.documents:
+        if not len(self.parent_store):
             return {}
 
-        categories = {}
-
-        for doc in self.documents:
-            # 统计分类
-            category = doc.metadata.get('category', '未知')
-            categories[category] = categories.get(category, 0) + 1
-
         return {
-            'total_documents': len(self.documents),
+            'total_documents': len(self.parent_store),
             'total_chunks': len(self.chunks),
-            'categories': categories,
+            'categories': self.parent_store.category_counts(),
+            'parent_store': self.parent_store.get_stats(),
             'avg_chunk_size': sum(chunk.metadata.get('chunk_size', 0) for chunk in self.chunks) / len(self.chunks) if self.chunks else 0
         }
     
@@ -301,7 +651,10 @@ class DataPreparationModule:
         import json
         
         metadata_list = []
-        for doc in self.documents:
+        for metadata in self.parent_store.iter_metadata():
+            doc = self.parent_store.get(metadata['parent_id'])
+            if doc is None:
+                continue
             metadata_list.append({
                 'source': doc.metadata.get('source'),
                 'title': doc.metadata.get('tile'),
@@ -326,7 +679,6 @@ class DataPreparationModule:
         """
         # 统计每个父文档被匹配的次数（相关性指标）
         parent_relevance = {}
-        parent_docs_map = {}
 
         # 收集所有相关的父文档ID和相关性分数
         for chunk in child_chunks:
@@ -335,31 +687,21 @@ class DataPreparationModule:
                 # 增加相关性计数
                 parent_relevance[parent_id] = parent_relevance.get(parent_id, 0) + 1
 
-                # 缓存父文档（避免重复查找）
-                if parent_id not in parent_docs_map:
-                    for doc in self.documents:
-                        if doc.metadata.get("parent_id") == parent_id:
-                            parent_docs_map[parent_id] = doc
-                            break
-
         # 按相关性排序（匹配次数多的排在前面）
         sorted_parent_ids = sorted(parent_relevance.keys(),
                                  key=lambda x: parent_relevance[x],
                                  reverse=True)
 
-        # 构建去重后的父文档列表
-        parent_docs = []
-        for parent_id in sorted_parent_ids:
-            if parent_id in parent_docs_map:
-                parent_docs.append(parent_docs_map[parent_id])
+        # 构建去重后的父文档列表 - 按ID从父文档存储中获取，正文按需读取
+        parent_docs = self.parent_store.get_many(sorted_parent_ids)
 
         # 收集父文档名称和相关性信息用于日志
         parent_info = []
         for doc in parent_docs:
-            dish_name = doc.metadata.get('dish_name', '未知菜品')
+            title = doc.metadata.get('title', '未知文档')
             parent_id = doc.metadata.get('parent_id')
             relevance_count = parent_relevance.get(parent_id, 0)
-            parent_info.append(f"{dish_name}({relevance_count}块)")
+            parent_info.append(f"{title}({relevance_count}块)")
 
         logger.info(f"从 {len(child_chunks)} 个子块中找到 {len(parent_docs)} 个去重父文档: {', '.join(parent_info)}")
         return parent_docs
\ No newline at end of file
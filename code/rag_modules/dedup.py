@@ -0,0 +1,313 @@
+"""
+chunk去重模块
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set
+
+import numpy as np
+from langchain_core.documents import Document
+
+from diversity import char_shingles, normalize_text
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def duplicate_closure(chunks: Iterable[Document], parent_ids: Iterable[str]) -> Set[str]:
+    """
+    计算受影响父文档的闭包 - 规范chunk与其归并的重复来源互相依赖，任意一方变化都需要整组重新分块
+
+    Args:
+        chunks: 索引中的chunk
+        parent_ids: 新增、修改或删除的父文档ID
+
+    Returns:
+        需要从索引中移除并重新分块的父文档ID集合(包含parent_ids)
+    """
+    affected = set(parent_ids)
+    groups = [
+        {chunk.metadata.get('parent_id')} | set(chunk.metadata['duplicate_parent_ids'])
+        for chunk in chunks if chunk.metadata.get('duplicate_parent_ids')
+    ]
+    changed = True
+    while changed:
+        changed = False
+        for group in groups:
+            if group & affected and not group <= affected:
+                affected |= group
+                changed = True
+    affected.discard(None)
+    return affected
+
+
+class ChunkDeduplicator:
+    """chunk去重 - 先按归一化内容哈希精确去重，再用MinHash-LSH合并近似重复，重复chunk只保留一个规范chunk写入索引"""
+
+    FORMAT_VERSION = 1
+    SIGNATURES_FILENAME = "dedup_signatures.npz"
+
+    def __init__(self, near_duplicate: bool = False, threshold: float = 0.9, num_perm: int = 128,
+                 bands: int = 32, shingle_size: int = 5, min_length: int = 50, seed: int = 1):
+        """
+        初始化去重器
+
+        Args:
+            near_duplicate: 是否合并近似重复(否则只做精确去重)；合并后只保留规范chunk的文本，仅版本号等细节不同的内容会丢失
+            threshold: 视为近似重复的Jaccard相似度(MinHash估计值)下限
+            num_perm: MinHash签名长度
+            bands: LSH分段数，num_perm需能被整除
+            shingle_size: 字符n-gram长度
+            min_length: 归一化后短于该长度的chunk只做精确去重(标题、短句容易误判)
+            seed: 哈希排列的随机种子
+        """
+        if num_perm % bands:
+            raise ValueError(f"MinHash签名长度({num_perm})需能被LSH分段数({bands})整除")
+        self.near_duplicate = near_duplicate
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_length = min_length
+        self.seed = seed
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+        # chunk ID -> MinHash签名(仅规范chunk)，持久化后增量更新时无需重新计算已有chunk
+        self.signatures: Dict[str, np.ndarray] = {}
+        # 本轮去重中吸收了重复chunk的规范chunk ID -> 需要写入的元数据
+        self.merged: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'input': 0, 'exact_duplicates': 0, 'near_duplicates': 0}
+        self._reset()
+
+    def _reset(self):
+        """清空单轮去重的状态"""
+        self.merged = {}
+        self._exact: Dict[str, str] = {}
+        self._buckets: Dict[tuple, List[str]] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+
+    def minhash(self, text: str) -> np.ndarray:
+        """
+        计算文本的MinHash签名
+
+        Args:
+            text: 文本
+
+        Returns:
+            长度为num_perm的uint32签名
+        """
+        shingles = set(char_shingles(text, self.shingle_size))
+        if not shingles:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+             for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        permuted = ((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def deduplicate(self, chunks: Iterable[Document], existing: Iterable[Document] = ()) -> List[Document]:
+        """
+        去重一批chunk
+
+        Args:
+            chunks: 待写入索引的chunk
+            existing: 已在索引中的chunk，作为规范chunk优先保留
+
+        Returns:
+            需要写入索引的规范chunk；吸收了重复chunk的已有chunk记录在 self.merged 中
+        """
+        return list(self.iter_unique(chunks, existing))
+
+    def iter_unique(self, chunks: Iterable[Document], existing: Iterable[Document] = ()) -> Iterator[Document]:
+        """
+        流式去重 - 逐个产出规范chunk
+
+        后出现的重复chunk会更新已产出的规范chunk的元数据，流式写入索引时需要在结束后
+        按 self.merged 回写索引中的元数据。
+
+        Args:
+            chunks: 待写入索引的chunk
+            existing: 已在索引中的chunk，作为规范chunk优先保留
+
+        Yields:
+            规范chunk
+        """
+        self._reset()
+        for chunk in existing:
+            self._register(chunk.metadata['chunk_id'], chunk.page_content, dict(chunk.metadata))
+
+        input_count, exact_count, near_count = 0, 0, 0
+        for chunk in chunks:
+            input_count += 1
+            signature = None
+            canonical_id = self._exact.get(self._content_key(chunk.page_content))
+            if canonical_id is not None:
+                exact_count += 1
+            elif self._is_near_candidate(chunk.page_content):
+                signature = self.minhash(chunk.page_content)
+                canonical_id = self._find_near_duplicate(signature)
+                if canonical_id is not None:
+                    near_count += 1
+
+            if canonical_id is None:
+                self._register(chunk.metadata['chunk_id'], chunk.page_content, chunk.metadata, signature)
+                yield chunk
+            else:
+                self._absorb(canonical_id, chunk)
+
+        # 只保留规范chunk的签名(chunk ID包含内容哈希，全量重建时未变化的chunk可直接复用)
+        self.signatures = {chunk_id: sig for chunk_id, sig in self.signatures.items() if chunk_id in self._metadata}
+        self.stats['input'] += input_count
+        self.stats['exact_duplicates'] += exact_count
+        self.stats['near_duplicates'] += near_count
+        logger.info(f"chunk去重完成: 输入 {input_count} 个, 精确重复 {exact_count} 个, "
+                    f"近似重复 {near_count} 个, 保留 {input_count - exact_count - near_count} 个")
+
+    @staticmethod
+    def _content_key(text: str) -> str:
+        """归一化内容哈希 - 仅空白、大小写或全半角不同的chunk视为完全相同"""
+        return hashlib.md5(normalize_text(text).encode("utf-8")).hexdigest()
+
+    def _band_keys(self, signature: np.ndarray) -> List[tuple]:
+        """LSH分段的桶键"""
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _is_near_candidate(self, text: str) -> bool:
+        return self.near_duplicate and len(normalize_text(text)) >= self.min_length
+
+    def _register(self, chunk_id: str, text: str, metadata: Dict[str, Any], signature: Optional[np.ndarray] = None):
+        """登记规范chunk，供后续chunk比较"""
+        self._exact.setdefault(self._content_key(text), chunk_id)
+        self._metadata[chunk_id] = metadata
+        if not self._is_near_candidate(text):
+            return
+        if signature is None:
+            signature = self.signatures.get(chunk_id)
+        if signature is None:
+            signature = self.minhash(text)
+        self.signatures[chunk_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(chunk_id)
+
+    def _find_near_duplicate(self, signature: np.ndarray) -> Optional[str]:
+        """在LSH桶中查找与签名近似重复的规范chunk，返回估计相似度最高的一个"""
+        candidates = {chunk_id for key in self._band_keys(signature) for chunk_id in self._buckets.get(key, ())}
+        best_id, best_similarity = None, self.threshold
+        for chunk_id in sorted(candidates):
+            similarity = float(np.mean(self.signatures[chunk_id] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = chunk_id, similarity
+        return best_id
+
+    def _absorb(self, canonical_id: str, duplicate: Document):
+        """将重复chunk的来源合并到规范chunk的元数据中"""
+        metadata = self._metadata[canonical_id]
+        parent_ids = list(metadata.get('duplicate_parent_ids', []))
+        sources = list(metadata.get('duplicate_sources', []))
+        categories = list(metadata.get('duplicate_categories', []))
+        titles = list(metadata.get('duplicate_titles', []))
+        parent_id = duplicate.metadata.get('parent_id')
+        if parent_id and parent_id != metadata.get('parent_id') and parent_id not in parent_ids:
+            parent_ids.append(parent_id)
+            source = duplicate.metadata.get('source')
+            if source and source not in sources:
+                sources.append(source)
+        # 重复来源的分类和标题也要保留，按这些字段过滤时规范chunk仍能代表被合并的副本
+        category = duplicate.metadata.get('category')
+        if category and category != metadata.get('category') and category not in categories:
+            categories.append(category)
+        title = duplicate.metadata.get('title')
+        if title and title != metadata.get('title') and title not in titles:
+            titles.append(title)
+
+        updates = {
+            'duplicate_parent_ids': parent_ids,
+            'duplicate_sources': sources,
+            'duplicate_categories': categories,
+            'duplicate_titles': titles,
+            'duplicate_count': metadata.get('duplicate_count', 0) + 1
+        }
+        metadata.update(updates)
+        self.merged[canonical_id] = updates
+
+    def save(self, path: str):
+        """
+        保存MinHash签名到npz文件
+
+        Args:
+            path: 文件路径
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            'format_version': self.FORMAT_VERSION,
+            'num_perm': self.num_perm,
+            'shingle_size': self.shingle_size,
+            'seed': self.seed
+        }
+        chunk_ids = sorted(self.signatures)
+        signatures = np.stack([self.signatures[chunk_id] for chunk_id in chunk_ids]) if chunk_ids \
+            else np.zeros((0, self.num_perm), dtype=np.uint32)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            meta=np.array(json.dumps(meta)),
+            chunk_ids=np.array(chunk_ids, dtype=str),
+            signatures=signatures
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"MinHash签名已保存到: {path}")
+
+    def load(self, path: str) -> bool:
+        """
+        从npz文件加载MinHash签名，参数不一致时忽略(缺失的签名在去重时按需计算)
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            是否加载成功
+        """
+        if not Path(path).exists():
+            return False
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if (meta.get('format_version') != self.FORMAT_VERSION
+                        or meta.get('num_perm') != self.num_perm
+                        or meta.get('shingle_size') != self.shingle_size
+                        or meta.get('seed') != self.seed):
+                    logger.info("MinHash签名参数已变化，将重新计算")
+                    return False
+                self.signatures = dict(zip(data['chunk_ids'].tolist(), data['signatures']))
+        except Exception as e:
+            logger.warning(f"读取MinHash签名失败: {e}")
+            return False
+
+        logger.info(f"MinHash签名已从 {path} 加载: {len(self.signatures)} 个chunk")
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取去重统计信息
+
+        Returns:
+            统计信息字典
+        """
+        duplicates = self.stats['exact_duplicates'] + self.stats['near_duplicates']
+        return {
+            **self.stats,
+            'duplicate_rate': duplicates / self.stats['input'] if self.stats['input'] else 0.0,
+            'signatures': len(self.signatures)
+        }
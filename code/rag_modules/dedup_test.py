@@ -0,0 +1,85 @@
+"""
+chunk去重模块测试程序
+测试默认配置只合并内容完全相同的chunk，仅版本号或JEP编号不同的chunk都会保留
+"""
+import os
+import sys
+
+from langchain_core.documents import Document
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dedup import ChunkDeduplicator
+
+# 摘自知识库 java22-23.md / java24.md，两节只有标题中的JEP编号和预览次数不同
+SCOPED_VALUES_BODY = """作用域值（Scoped Values）可以在线程内和线程间共享不可变的数据，优于线程局部变量，尤其是在使用大量虚拟线程时。
+
+```java
+final static ScopedValue<...> V = new ScopedValue<>();
+
+// In some method
+ScopedValue.where(V, <value>)
+           .run(() -> { ... V.get() ... call methods ... });
+
+// In a method called directly or indirectly from the lambda expression
+... V.get() ...
+```
+
+作用域值允许在大型程序中的组件之间安全有效地共享数据，而无需求助于方法参数。"""
+
+
+def scoped_values_section(jep: int, stage: str) -> str:
+    return f"## JEP {jep}: 作用域值 （{stage}）\n\n" + SCOPED_VALUES_BODY
+
+
+def make_chunk(chunk_id: str, parent_id: str, text: str, category: str = "java") -> Document:
+    return Document(page_content=text, metadata={
+        "chunk_id": chunk_id, "parent_id": parent_id, "source": f"{parent_id}.md",
+        "category": category, "title": parent_id
+    })
+
+
+def make_default_deduplicator() -> ChunkDeduplicator:
+    """按默认参数创建去重器(与 RAGConfig 的默认值一致)"""
+    return ChunkDeduplicator()
+
+
+def test_version_variants_are_kept():
+    """仅JEP编号或版本号不同的chunk都保留"""
+    chunks = [
+        make_chunk("java22-0", "java22-23", scoped_values_section(481, "第三次预览")),
+        make_chunk("java24-0", "java24", scoped_values_section(487, "第四次预览")),
+        make_chunk("java25-0", "java25", scoped_values_section(506, "正式")),
+    ]
+    deduplicator = make_default_deduplicator()
+    unique = deduplicator.deduplicate(chunks)
+
+    assert [chunk.metadata["chunk_id"] for chunk in unique] == ["java22-0", "java24-0", "java25-0"]
+    assert deduplicator.merged == {}
+
+    # 开启近似去重后这些chunk会被合并，版本相关的内容无法再检索到，因此默认关闭
+    assert len(ChunkDeduplicator(near_duplicate=True).deduplicate(chunks)) < len(chunks)
+
+
+def test_exact_duplicates_are_merged():
+    """仅空白、大小写或全半角不同的chunk合并到规范chunk，并记录副本的来源、分类和标题"""
+    text = scoped_values_section(481, "第三次预览")
+    chunks = [
+        make_chunk("java22-0", "java22-23", text),
+        make_chunk("copy-0", "copy", "  " + text.replace("Scoped Values", "scoped   values"), category="jvm"),
+    ]
+    deduplicator = make_default_deduplicator()
+    unique = deduplicator.deduplicate(chunks)
+
+    assert [chunk.metadata["chunk_id"] for chunk in unique] == ["java22-0"]
+    merged = deduplicator.merged["java22-0"]
+    assert merged["duplicate_parent_ids"] == ["copy"]
+    assert merged["duplicate_categories"] == ["jvm"]
+    assert merged["duplicate_titles"] == ["copy"]
+
+
+if __name__ == "__main__":
+    test_version_variants_are_kept()
+    test_exact_duplicates_are_merged()
+    print("✅ chunk去重模块测试通过")
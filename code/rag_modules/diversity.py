@@ -0,0 +1,252 @@
+"""
+结果多样化模块
+"""
+
+import os
+import json
+import hashlib
+import logging
+import unicodedata
+from pathlib import Path
+from typing import List, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+_BIT_SHIFTS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+
+
+def normalize_text(text: str) -> str:
+    """文本归一化 - 全角转半角、转小写、去掉空白"""
+    return "".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+def char_shingles(text: str, size: int) -> List[str]:
+    """归一化文本后的字符n-gram"""
+    normalized = normalize_text(text)
+    if len(normalized) <= size:
+        return [normalized] if normalized else []
+    return [normalized[i:i + size] for i in range(len(normalized) - size + 1)]
+
+
+def simhash(text: str, shingle_size: int = 4) -> int:
+    """
+    计算文本的64位SimHash - 近似重复的文本签名之间的汉明距离很小
+
+    Args:
+        text: 文本
+        shingle_size: 字符n-gram长度
+
+    Returns:
+        64位签名
+    """
+    shingles = set(char_shingles(text, shingle_size))
+    if not shingles:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+         for shingle in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    bits = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int32)
+    votes = (2 * bits - 1).sum(axis=0)
+    return int((np.uint64(1) << _BIT_SHIFTS[votes > 0]).sum(dtype=np.uint64))
+
+
+def hamming_distance(signatures: np.ndarray, signature: int) -> np.ndarray:
+    """计算一组签名与单个签名的汉明距离"""
+    xor = np.bitwise_xor(signatures.astype(np.uint64), np.uint64(signature))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class SimHashIndex:
+    """SimHash签名索引 - 按chunk位置保存预先计算的签名，检索时无需重新读取或嵌入文本"""
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, shingle_size: int = 4):
+        """
+        初始化签名索引
+
+        Args:
+            shingle_size: 字符n-gram长度
+        """
+        self.shingle_size = shingle_size
+        self.corpus_version: Optional[str] = None
+        self.chunk_ids: List[str] = []
+        self.signatures = np.zeros(0, dtype=np.uint64)
+
+    @classmethod
+    def build(cls, texts: Sequence[str], chunk_ids: List[str], corpus_version: Optional[str] = None,
+              shingle_size: int = 4) -> 'SimHashIndex':
+        """
+        计算全部chunk的签名
+
+        Args:
+            texts: 按位置排列的chunk文本
+            chunk_ids: 与文本一一对应的ID
+            corpus_version: 语料版本(摄取清单摘要)
+            shingle_size: 字符n-gram长度
+
+        Returns:
+            签名索引
+        """
+        index = cls(shingle_size)
+        index.corpus_version = corpus_version
+        index.chunk_ids = list(chunk_ids)
+        index.signatures = np.fromiter((simhash(text, shingle_size) for text in texts),
+                                       dtype=np.uint64, count=len(texts))
+        logger.info(f"SimHash签名计算完成: {len(texts)} 个chunk")
+        return index
+
+    def near_duplicates(self, position: int, positions: np.ndarray, max_distance: int) -> np.ndarray:
+        """
+        判断一组chunk是否与指定chunk近似重复
+
+        Args:
+            position: 指定chunk的位置
+            positions: 待比较的chunk位置
+            max_distance: 视为近似重复的最大汉明距离
+
+        Returns:
+            与positions对应的布尔数组
+        """
+        if not len(positions):
+            return np.zeros(0, dtype=bool)
+        return hamming_distance(self.signatures[positions], int(self.signatures[position])) <= max_distance
+
+    def save(self, path: str):
+        """
+        保存签名到npz文件
+
+        Args:
+            path: 文件路径
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            'format_version': self.FORMAT_VERSION,
+            'corpus_version': self.corpus_version,
+            'shingle_size': self.shingle_size
+        }
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            meta=np.array(json.dumps(meta)),
+            chunk_ids=np.array(self.chunk_ids, dtype=str),
+            signatures=self.signatures
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"SimHash签名已保存到: {path}")
+
+    @classmethod
+    def load(cls, path: str, corpus_version: Optional[str], chunk_ids: List[str],
+             shingle_size: int = 4) -> Optional['SimHashIndex']:
+        """
+        从npz文件加载签名，格式、n-gram长度、语料版本或chunk列表不一致时视为过期
+
+        Args:
+            path: 文件路径
+            corpus_version: 当前语料版本
+            chunk_ids: 当前按位置排列的chunk ID
+            shingle_size: 字符n-gram长度
+
+        Returns:
+            签名索引，不存在或已过期时返回None
+        """
+        if not Path(path).exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if (meta.get('format_version') != cls.FORMAT_VERSION
+                        or meta.get('shingle_size') != shingle_size
+                        or meta.get('corpus_version') != corpus_version
+                        or data['chunk_ids'].tolist() != list(chunk_ids)):
+                    logger.info("SimHash签名已过期，将重新计算")
+                    return None
+
+                index = cls(shingle_size)
+                index.corpus_version = meta['corpus_version']
+                index.chunk_ids = list(chunk_ids)
+                index.signatures = data['signatures'].astype(np.uint64)
+        except Exception as e:
+            logger.warning(f"读取SimHash签名失败: {e}")
+            return None
+
+        logger.info(f"SimHash签名已从 {path} 加载")
+        return index
+
+
+def mmr_select(relevance: np.ndarray, vectors: Optional[np.ndarray], k: int, lambda_mult: float = 0.7,
+               duplicates: Optional[np.ndarray] = None) -> List[int]:
+    """
+    最大边际相关性(MMR)选择 - 每次选出 lambda * 相关度 - (1 - lambda) * 与已选结果的最大相似度 最高的候选
+
+    Args:
+        relevance: 候选的相关度，已归一化到[0, 1]
+        vectors: 候选的单位化向量，为None时只按相关度和近似重复关系选择
+        k: 选择数量
+        lambda_mult: 相关度与多样性之间的权衡，1为只看相关度
+        duplicates: 候选之间的近似重复关系(布尔矩阵)，与已选结果近似重复的候选不再入选
+
+    Returns:
+        按选择顺序排列的候选下标
+    """
+    n = len(relevance)
+    similarity = vectors @ vectors.T if vectors is not None else None
+    max_similarity = np.zeros(n, dtype=np.float64)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+
+    while len(selected) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        if duplicates is not None:
+            available &= ~duplicates[best]
+        if similarity is not None:
+            np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def diversify(ranked: Sequence[Tuple[Hashable, float]], positions: np.ndarray, top_k: int,
+              signatures: Optional[SimHashIndex] = None, vectors: Optional[np.ndarray] = None,
+              lambda_mult: float = 0.7, max_distance: int = 3) -> List[Tuple[Hashable, float]]:
+    """
+    对排好序的候选做多样化选择 - 先用SimHash去掉近似重复，再按MMR在相关度和新颖度之间权衡
+
+    Args:
+        ranked: 按相关度降序的 (结果ID, 分数) 列表
+        positions: 与ranked对应的chunk位置
+        top_k: 返回结果数量
+        signatures: SimHash签名索引，为None时不做近似重复过滤
+        vectors: 与ranked对应的向量(未单位化也可)，为None时不做MMR
+        lambda_mult: MMR中相关度的权重
+        max_distance: 视为近似重复的最大汉明距离
+
+    Returns:
+        选出的 (结果ID, 分数) 列表，保持MMR的选择顺序
+    """
+    if len(ranked) <= 1:
+        return list(ranked[:top_k])
+
+    scores = np.asarray([score for _, score in ranked], dtype=np.float64)
+    low, high = scores.min(), scores.max()
+    relevance = (scores - low) / (high - low) if high > low else np.ones_like(scores)
+
+    duplicates = None
+    if signatures is not None:
+        duplicates = np.stack([signatures.near_duplicates(position, positions, max_distance)
+                               for position in positions])
+
+    unit_vectors = None
+    if vectors is not None:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit_vectors = vectors / np.where(norms > 0, norms, 1)
+
+    selected = mmr_select(relevance, unit_vectors, top_k, lambda_mult, duplicates)
+    return [ranked[i] for i in selected]
@@ -0,0 +1,106 @@
+"""
+嵌入缓存模块
+"""
+
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from pathlib import Path
+from typing import List, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """嵌入缓存 - 以(嵌入模型, 规范化文本哈希)为键，将float32向量持久化到SQLite"""
+
+    # SQLite单条语句的参数数量有上限，批量查询时分段执行
+    _QUERY_BATCH = 500
+
+    def __init__(self, db_path: str, model_name: str):
+        """
+        初始化嵌入缓存
+
+        Args:
+            db_path: SQLite数据库文件路径
+            model_name: 嵌入模型名称，不同模型的向量互不复用
+        """
+        self.db_path = db_path
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        logger.info(f"嵌入缓存已打开: {db_path}")
+
+    def make_key(self, text: str) -> str:
+        """
+        生成缓存键 - 文本先做Unicode规范化并去除首尾空白
+
+        Args:
+            text: 原始文本
+
+        Returns:
+            缓存键
+        """
+        normalized = unicodedata.normalize("NFC", text).strip()
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[int, List[float]]:
+        """
+        批量查询缓存
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            命中的 {文本下标: 向量} 字典
+        """
+        keys = [self.make_key(text) for text in texts]
+        found = {}
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), self._QUERY_BATCH):
+                batch = unique_keys[start:start + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        result = {i: found[key] for i, key in enumerate(keys) if key in found}
+        self.hits += len(result)
+        self.misses += len(texts) - len(result)
+        return result
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """
+        批量写入缓存
+
+        Args:
+            texts: 文本列表
+            vectors: 与文本一一对应的向量列表
+        """
+        rows = [
+            (self.make_key(text), np.asarray(vector, dtype=np.float32).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
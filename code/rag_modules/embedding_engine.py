@@ -0,0 +1,163 @@
+"""
+嵌入引擎模块
+"""
+
+import time
+import logging
+from typing import List, Dict, Any, Optional
+
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingEngine:
+    """嵌入引擎 - 按token长度分桶批量嵌入，减少padding浪费并统计吞吐量"""
+
+    def __init__(self, embeddings: HuggingFaceEmbeddings, batch_size: int = 32, num_threads: int = 0,
+                 cache: Optional[EmbeddingCache] = None):
+        """
+        初始化嵌入引擎
+
+        Args:
+            embeddings: HuggingFace嵌入模型
+            batch_size: 每批嵌入的文本数量
+            num_threads: torch CPU线程数，0表示使用torch默认值
+            cache: 持久化嵌入缓存，为None时不使用缓存
+        """
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.num_threads = num_threads
+        self.cache = cache
+        self.tokenizer = None
+        self.max_seq_length = None
+        self.stats = {
+            'texts': 0,
+            'tokens': 0,
+            'batches': 0,
+            'seconds': 0.0
+        }
+        self._setup_backend()
+
+    def _setup_backend(self):
+        """配置CPU线程数并获取模型的分词器，用于按token长度分桶"""
+        if self.num_threads > 0:
+            try:
+                import torch
+                torch.set_num_threads(self.num_threads)
+                logger.info(f"嵌入引擎使用 {self.num_threads} 个CPU线程")
+            except ImportError:
+                logger.warning("未安装torch，忽略嵌入线程数配置")
+
+        # langchain_huggingface 内部持有的 SentenceTransformer 实例
+        client = getattr(self.embeddings, '_client', None) or getattr(self.embeddings, 'client', None)
+        if client is not None:
+            self.tokenizer = getattr(client, 'tokenizer', None)
+            self.max_seq_length = getattr(client, 'max_seq_length', None)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        统计每段文本的token数(超过模型最大长度的部分会被截断，按截断后计算)
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            token数列表
+        """
+        if self.tokenizer is None:
+            # 无分词器时以字符数近似
+            lengths = [len(text) for text in texts]
+        else:
+            encoded = self.tokenizer(texts, add_special_tokens=True, truncation=False)['input_ids']
+            lengths = [len(ids) for ids in encoded]
+
+        if self.max_seq_length:
+            lengths = [min(length, self.max_seq_length) for length in lengths]
+        return lengths
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量嵌入文本 - 先查嵌入缓存，未命中的文本再交给模型计算并写回缓存
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入顺序一致的向量列表
+        """
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for i, vector in self.cache.get_many(texts).items():
+            vectors[i] = vector
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            missing_vectors = self._embed_uncached(missing_texts)
+            self.cache.put_many(missing_texts, missing_vectors)
+            for i, vector in zip(missing, missing_vectors):
+                vectors[i] = vector
+
+        logger.info(f"嵌入缓存命中 {len(texts) - len(missing)}/{len(texts)} 个文本")
+        return vectors
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """
+        调用模型批量嵌入文本 - 按token长度排序后分批，使同一批内长度接近
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入顺序一致的向量列表
+        """
+        start_time = time.perf_counter()
+        lengths = self.count_tokens(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        batches = 0
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+            batch_vectors = self.embeddings.embed_documents([texts[i] for i in batch_indices])
+            for i, vector in zip(batch_indices, batch_vectors):
+                vectors[i] = vector
+            batches += 1
+
+        elapsed = time.perf_counter() - start_time
+        total_tokens = sum(lengths)
+        self.stats['texts'] += len(texts)
+        self.stats['tokens'] += total_tokens
+        self.stats['batches'] += batches
+        self.stats['seconds'] += elapsed
+
+        logger.info(
+            f"嵌入完成: {len(texts)} 个文本, {batches} 批, 耗时 {elapsed:.2f} 秒, "
+            f"{len(texts) / elapsed if elapsed else 0:.1f} chunks/s, "
+            f"{total_tokens / elapsed if elapsed else 0:.1f} tokens/s"
+        )
+        return vectors
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取累计吞吐量统计
+
+        Returns:
+            统计信息字典
+        """
+        seconds = self.stats['seconds']
+        stats = {
+            **self.stats,
+            'chunks_per_second': self.stats['texts'] / seconds if seconds else 0.0,
+            'tokens_per_second': self.stats['tokens'] / seconds if seconds else 0.0
+        }
+        if self.cache is not None:
+            stats['cache_hits'] = self.cache.hits
+            stats['cache_misses'] = self.cache.misses
+        return stats
@@ -0,0 +1,74 @@
+"""
+结果融合模块
+"""
+
+import logging
+from typing import List, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FUSION_STRATEGIES = ("rrf", "weighted_sum", "combmnz")
+
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    """将单路检索的分数线性归一化到[0, 1]，分数全部相同时视为1"""
+    low, high = scores.min(), scores.max()
+    if high - low <= 0:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def fuse(ranked_lists: Sequence[Sequence[Tuple[Hashable, float]]], weights: Optional[Sequence[float]] = None,
+         strategy: str = "rrf", rrf_k: int = 60) -> List[Tuple[Hashable, float]]:
+    """
+    融合多路检索结果
+
+    - rrf: sum(w / (rrf_k + rank))，只依赖排名
+    - weighted_sum: 各路分数min-max归一化后加权求和
+    - combmnz: 归一化分数加权求和，再乘以命中该结果的检索路数
+
+    Args:
+        ranked_lists: 每路检索按相关度降序的 (结果ID, 分数) 列表，分数越大越相关
+        weights: 每路检索的权重，为None时均为1
+        strategy: 融合策略(rrf / weighted_sum / combmnz)
+        rrf_k: RRF平滑参数
+
+    Returns:
+        按融合分数降序的 (结果ID, 融合分数) 列表，分数相同时先出现的排在前面
+    """
+    if strategy not in FUSION_STRATEGIES:
+        raise ValueError(f"不支持的融合策略: {strategy}，可选: {', '.join(FUSION_STRATEGIES)}")
+    if weights is None:
+        weights = [1.0] * len(ranked_lists)
+    if len(weights) != len(ranked_lists):
+        raise ValueError(f"权重数量({len(weights)})与检索路数({len(ranked_lists)})不一致")
+
+    id_parts, contribution_parts = [], []
+    for results, weight in zip(ranked_lists, weights):
+        if not results or weight == 0:
+            continue
+        ids, scores = zip(*results)
+        if strategy == "rrf":
+            contributions = weight / (rrf_k + np.arange(1, len(ids) + 1, dtype=np.float64))
+        else:
+            contributions = weight * _min_max(np.asarray(scores, dtype=np.float64))
+        id_parts.extend(ids)
+        contribution_parts.append(contributions)
+
+    if not id_parts:
+        return []
+
+    # 为每个结果ID分配槽位，按首次出现的顺序编号，保证同分时的顺序稳定
+    slots = {}
+    inverse = np.fromiter((slots.setdefault(doc_id, len(slots)) for doc_id in id_parts),
+                          dtype=np.int64, count=len(id_parts))
+    fused = np.bincount(inverse, weights=np.concatenate(contribution_parts), minlength=len(slots))
+    if strategy == "combmnz":
+        fused *= np.bincount(inverse, minlength=len(slots))
+
+    unique_ids = list(slots)
+    order = np.argsort(-fused, kind='stable')
+    logger.debug(f"融合完成({strategy}): {len(ranked_lists)} 路检索, 合并后 {len(unique_ids)} 个结果")
+    return [(unique_ids[i], float(fused[i])) for i in order]
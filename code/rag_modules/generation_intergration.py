@@ -3,8 +3,11 @@
 """
 
 import os
+import re
+import time
 import logging
-from typing import List
+import threading
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional
 
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_community.chat_models.moonshot import MoonshotChat
@@ -12,12 +15,34 @@ from langchain_core.documents import Document
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
+from bm25_index import cjk_bigram_tokenize
+from context_builder import ContextBuilder
+from lru_cache import TTLLRUCache
+
 logger = logging.getLogger(__name__)
 
+# 口语化/宽泛的表达，出现时交给LLM判断是否重写
+_VAGUE_MARKERS = ("怎么学", "如何学", "学习路线", "推荐", "什么是好的", "面试题", "基础知识", "入门")
+_CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+# 有内部结构的标识符: 驼峰(HashMap)、下划线(max_connections)、字母数字混合(G1)
+_STRUCTURED_IDENTIFIER_PATTERN = re.compile(r"[a-z][A-Z]|[A-Za-z]_[A-Za-z]|[A-Za-z][0-9]")
+# 宽泛的英文词(语言/框架名、疑问词、虚词)，即使在语料中常见也不能说明查询具体
+_GENERIC_TERMS = frozenset({
+    "java", "python", "go", "golang", "c", "cpp", "js", "javascript", "spring", "boot", "springboot",
+    "framework", "web", "api", "code", "coding", "program", "programming", "interview", "question",
+    "learn", "learning", "study", "guide", "tutorial", "basic", "basics", "best", "good", "intro",
+    "how", "what", "why", "when", "where", "which", "who", "is", "are", "do", "does", "can",
+    "to", "the", "a", "an", "and", "or", "of", "in", "on", "for", "with", "about", "use", "using", "vs"
+})
+
 class GenerationIntegrationModule:
     """生成集成模块 - 负责LLM集成和回答生成"""
 
-    def __init__(self, model_name: str = "kimi-k2-0711-preview", temperature: float = 0.1, max_tokens: int = 2048):
+    def __init__(self, model_name: str = "kimi-k2-0711-preview", temperature: float = 0.1, max_tokens: int = 2048,
+                 rewrite_cache_size: int = 1024, rewrite_cache_ttl: float = 86400,
+                 enable_rewrite_classifier: bool = True, rewrite_min_length: int = 6,
+                 context_max_tokens: int = 3000, context_tokenizer: str = "cjk_bigram"):
         """
         初始化生成集成模块
         
@@ -25,10 +50,34 @@ class GenerationIntegrationModule:
             model_name: 模型名称
             temperature: 生成温度
             max_tokens: 最大token数
+            rewrite_cache_size: 查询重写结果缓存的最大条目数
+            rewrite_cache_ttl: 查询重写结果缓存的存活秒数
+            enable_rewrite_classifier: 是否用本地规则识别已足够具体的查询并跳过重写
+            rewrite_min_length: 短于该字符数的查询总是交给LLM判断
+            context_max_tokens: 回答提示词中检索上下文的token预算
+            context_tokenizer: 挑选相关句子时使用的分词器(与BM25一致)
         """
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.enable_rewrite_classifier = enable_rewrite_classifier
+        self.rewrite_min_length = rewrite_min_length
+        self.rewrite_cache = TTLLRUCache(max_size=rewrite_cache_size, ttl=rewrite_cache_ttl)
+        self.context_builder = ContextBuilder(
+            max_tokens=context_max_tokens, model_name=model_name, tokenizer=context_tokenizer
+        )
+        # 语料中的技术词(小写)和分类关键词，由 set_vocabulary 设置
+        self.known_terms = set()
+        self.category_keywords = set()
+        self.rewrite_stats = {
+            'requests': 0,
+            'cache_hits': 0,
+            'classifier_skips': 0,
+            'llm_calls': 0,
+            'llm_seconds': 0.0
+        }
+        # 重写统计会在推测检索的后台线程和并发的批量/异步查询中更新
+        self._stats_lock = threading.Lock()
         self.llm = None
         self.setup_llm()
 
@@ -58,30 +107,75 @@ class GenerationIntegrationModule:
         Returns:
             生成的回答
         """
-        context = self._build_context(context_docs)
+        context = self._build_context(context_docs, query)
 
-        prompt = ChatPromptTemplate.from_template("""
-你是一位经验丰富的Java后端开发工程师。请根据以下技术文档信息回答用户的问题。
+        # 使用LCEL构建链
+        chain = (
+            {"question": RunnablePassthrough(), "context": lambda _: context}
+            | self._answer_prompt()
+            | self.llm
+            | StrOutputParser()
+        )
 
-用户问题: {question}
+        response = chain.invoke(query)
+        return response
 
-相关技术文档信息:
-{context}
+    async def agenerate_basic_answer(self, query: str, context_docs: List[Document]) -> str:
+        """
+        生成基础回答 - 异步版本
 
-请提供详细、实用的回答。如果信息不足，请诚实说明。
+        Args:
+            query: 用户查询
+            context_docs: 上下文文档列表
 
-回答:""")
+        Returns:
+            生成的回答
+        """
+        context = self._build_context(context_docs, query)
 
-        # 使用LCEL构建链
         chain = (
             {"question": RunnablePassthrough(), "context": lambda _: context}
-            | prompt
+            | self._answer_prompt()
             | self.llm
             | StrOutputParser()
         )
 
-        response = chain.invoke(query)
-        return response
+        return await chain.ainvoke(query)
+
+    def generate_basic_answer_batch(self, queries: List[str], context_docs_list: List[List[Document]],
+                                    max_concurrency: int = 8) -> List[str]:
+        """
+        批量生成基础回答 - 并发调用LLM
+
+        Args:
+            queries: 用户查询列表
+            context_docs_list: 与queries一一对应的上下文文档列表
+            max_concurrency: 最大并发请求数
+
+        Returns:
+            与queries顺序一致的回答列表，单条生成失败时对应位置为异常对象
+        """
+        chain = self._answer_prompt() | self.llm | StrOutputParser()
+        inputs = [
+            {"question": query, "context": self._build_context(context_docs, query)}
+            for query, context_docs in zip(queries, context_docs_list)
+        ]
+        return chain.batch(inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+
+    @staticmethod
+    def _answer_prompt() -> ChatPromptTemplate:
+        """基础回答的提示词模板"""
+        return ChatPromptTemplate.from_template("""
+你是一位经验丰富的Java后端开发工程师。请根据以下技术文档信息回答用户的问题。
+
+用户问题: {question}
+
+相关技术文档信息:
+{context}
+
+请提供详细、实用的回答。如果信息不足，请诚实说明。
+
+回答:""")
     
     def query_rewrite(self,query: str) -> str:
         """
@@ -93,6 +187,180 @@ class GenerationIntegrationModule:
         Returns:
             重写后的查询或原查询
         """
+        shortcut = self._rewrite_shortcut(query)
+        if shortcut is not None:
+            return shortcut
+
+        start_time = time.perf_counter()
+        response = self._rewrite_chain().invoke(query).strip()
+        return self._record_rewrite(query, response, time.perf_counter() - start_time)
+
+    async def aquery_rewrite(self, query: str) -> str:
+        """
+        智能查询重写 - 异步版本
+
+        Args:
+            query: 原始查询
+
+        Returns:
+            重写后的查询或原查询
+        """
+        shortcut = self._rewrite_shortcut(query)
+        if shortcut is not None:
+            return shortcut
+
+        start_time = time.perf_counter()
+        response = (await self._rewrite_chain().ainvoke(query)).strip()
+        return self._record_rewrite(query, response, time.perf_counter() - start_time)
+
+    def _record_rewrite(self, query: str, response: str, elapsed: float) -> str:
+        """记录一次LLM重写的耗时并缓存结果"""
+        self._count_rewrite(llm_calls=1, llm_seconds=elapsed)
+        self.rewrite_cache.put(query.strip(), response)
+
+        # 记录重写结果
+        if response != query:
+            logger.info(f"查询已重写: '{query}' → '{response}'")
+        else:
+            logger.info(f"查询无需重写: '{query}'")
+
+        return response
+    
+    def query_rewrite_batch(self, queries: List[str], max_concurrency: int = 8) -> List[str]:
+        """
+        批量查询重写 - 并发调用LLM，单条失败时保留原查询
+
+        Args:
+            queries: 原始查询列表
+            max_concurrency: 最大并发请求数
+
+        Returns:
+            与queries顺序一致的重写后查询
+        """
+        rewritten = [self._rewrite_shortcut(query) for query in queries]
+        pending = [i for i, query in enumerate(rewritten) if query is None]
+
+        if pending:
+            start_time = time.perf_counter()
+            responses = self._rewrite_chain().batch(
+                [queries[i] for i in pending], config={"max_concurrency": max_concurrency}, return_exceptions=True
+            )
+            # 并发调用按墙钟时间计，平均单次延迟会被低估
+            self._count_rewrite(llm_calls=len(pending), llm_seconds=time.perf_counter() - start_time)
+
+            for i, response in zip(pending, responses):
+                if isinstance(response, Exception):
+                    logger.warning(f"查询重写失败，使用原查询: '{queries[i]}' ({response})")
+                    rewritten[i] = queries[i]
+                else:
+                    rewritten[i] = response.strip()
+                    self.rewrite_cache.put(queries[i].strip(), rewritten[i])
+
+        logger.info(f"批量查询重写完成: {sum(r != q for q, r in zip(queries, rewritten))}/{len(queries)} 个查询被重写, "
+                    f"{len(queries) - len(pending)} 个跳过LLM")
+        return rewritten
+
+    def _rewrite_shortcut(self, query: str) -> Optional[str]:
+        """
+        不调用LLM就能确定重写结果时直接返回 - 先查重写缓存，再用本地规则判断查询是否已足够具体
+
+        Args:
+            query: 原始查询
+
+        Returns:
+            重写结果，需要调用LLM时返回None
+        """
+        cached = self.rewrite_cache.get(query.strip())
+        if cached is not None:
+            self._count_rewrite(requests=1, cache_hits=1)
+            logger.info(f"查询重写缓存命中: '{query}' → '{cached}'")
+            return cached
+
+        if self.enable_rewrite_classifier and self.is_specific_query(query):
+            self._count_rewrite(requests=1, classifier_skips=1)
+            logger.info(f"查询已足够具体，跳过重写: '{query}'")
+            return query
+        self._count_rewrite(requests=1)
+        return None
+
+    def _count_rewrite(self, **increments: float):
+        """在锁内累加重写统计"""
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.rewrite_stats[key] += value
+
+    def set_vocabulary(self, terms: Iterable[str], category_keywords: Iterable[str] = ()):
+        """
+        设置查询预分类使用的词表
+
+        Args:
+            terms: 语料中有区分度的技术词(通常取自BM25词表中文档频率适中的词)，只保留英文/代码标识符
+            category_keywords: 分类名称，单独出现时视为宽泛查询
+        """
+        self.category_keywords = {keyword.lower() for keyword in category_keywords if keyword}
+        self.known_terms = {
+            term for term in (term.lower() for term in terms)
+            if term.isascii() and len(term) >= 2 and not term.isdigit()
+            and term not in _GENERIC_TERMS and term not in self.category_keywords
+        }
+        logger.info(f"查询预分类词表: {len(self.known_terms)} 个技术词, {len(self.category_keywords)} 个分类关键词")
+
+    def is_specific_query(self, query: str) -> bool:
+        """
+        本地判断查询是否已足够具体(无需重写)
+
+        - 过短或包含口语化/宽泛表达的查询不算具体
+        - 包含有区分度的技术词(语料中文档频率不高，且不是语言/框架名等宽泛词或分类名称)，如 "volatile 的作用"
+        - 或包含有内部结构的标识符且拆分后不全是宽泛词，如 "HashMap 和 ConcurrentHashMap 区别"
+        - 或者分类名称之外还有足够的中文描述，如 "MySQL 索引优化"
+        "Java 面试"、"Spring 框架"、"how to learn java" 之类只含宽泛词的查询交给LLM判断
+
+        Args:
+            query: 原始查询
+
+        Returns:
+            是否可以跳过重写
+        """
+        text = query.strip()
+        if len(text) < self.rewrite_min_length or any(marker in text for marker in _VAGUE_MARKERS):
+            return False
+
+        for identifier in _IDENTIFIER_PATTERN.findall(text):
+            if identifier.lower() in self.known_terms:
+                return True
+            if _STRUCTURED_IDENTIFIER_PATTERN.search(identifier):
+                # 第一个词是标识符整体，其后为驼峰/下划线拆分的子词
+                parts = cjk_bigram_tokenize(identifier)[1:]
+                if any(part not in _GENERIC_TERMS and part not in self.category_keywords
+                       for part in parts if not part.isdigit()):
+                    return True
+
+        remaining = text.lower()
+        matched_category = False
+        for keyword in self.category_keywords:
+            if keyword in remaining:
+                matched_category = True
+                remaining = remaining.replace(keyword, "")
+        return matched_category and len(_CJK_PATTERN.findall(remaining)) >= 4
+
+    def get_rewrite_stats(self) -> Dict[str, Any]:
+        """
+        获取查询重写统计 - 跳过率和按平均LLM延迟估算的节省时间
+
+        Returns:
+            统计信息字典
+        """
+        with self._stats_lock:
+            stats = dict(self.rewrite_stats)
+        skipped = stats['cache_hits'] + stats['classifier_skips']
+        avg_latency = stats['llm_seconds'] / stats['llm_calls'] if stats['llm_calls'] else 0.0
+        stats['skip_rate'] = skipped / stats['requests'] if stats['requests'] else 0.0
+        stats['avg_llm_latency'] = avg_latency
+        stats['estimated_saved_seconds'] = skipped * avg_latency
+        return stats
+
+    def _rewrite_chain(self):
+        """查询重写链"""
         prompt = PromptTemplate(
             template="""
 你是一个智能查询分析助手。请分析用户的查询，判断是否需要重写以提高技术文档搜索效果。
@@ -128,23 +396,13 @@ class GenerationIntegrationModule:
             input_variables=["query"]
         )
 
-        chain = (
+        return (
             {"query": RunnablePassthrough()}
             | prompt
             | self.llm
             | StrOutputParser()
         )
 
-        response = chain.invoke(query).strip()
-
-        # 记录重写结果
-        if response != query:
-            logger.info(f"查询已重写: '{query}' → '{response}'")
-        else:
-            logger.info(f"查询无需重写: '{query}'")
-
-        return response
-    
     def generate_basic_answer_stream(self, query: str, context_docs: List[Document]):
         """
         生成基础回答 - 流式输出
@@ -156,67 +414,65 @@ class GenerationIntegrationModule:
         Yields:
             生成的回答片段
         """
-        context = self._build_context(context_docs)
+        context = self._build_context(context_docs, query)
 
-        prompt = ChatPromptTemplate.from_template("""
-你是一位专业的Java后端工程师。请根据以下技术文档信息回答用户的问题。
+        chain = (
+            {"question": RunnablePassthrough(), "context": lambda _: context}
+            | self._stream_answer_prompt()
+            | self.llm
+            | StrOutputParser()
+        )
 
-用户问题: {question}
-                                                  
-相关技术文档信息:
-{context}
+        for chunk in chain.stream(query):
+            yield chunk
 
-请提供详细、实用的回答。如果信息不足，请诚实说明。
+    async def agenerate_basic_answer_stream(self, query: str, context_docs: List[Document]) -> AsyncIterator[str]:
+        """
+        生成基础回答 - 异步流式输出
 
-回答:""")
+        Args:
+            query: 用户查询
+            context_docs: 上下文文档列表
+
+        Yields:
+            生成的回答片段
+        """
+        context = self._build_context(context_docs, query)
 
         chain = (
             {"question": RunnablePassthrough(), "context": lambda _: context}
-            | prompt
+            | self._stream_answer_prompt()
             | self.llm
             | StrOutputParser()
         )
 
-        for chunk in chain.stream(query):
+        async for chunk in chain.astream(query):
             yield chunk
 
-    def _build_context(self, docs: List[Document], max_length: int = 4000) -> str:
+    @staticmethod
+    def _stream_answer_prompt() -> ChatPromptTemplate:
+        """流式回答的提示词模板"""
+        return ChatPromptTemplate.from_template("""
+你是一位专业的Java后端工程师。请根据以下技术文档信息回答用户的问题。
+
+用户问题: {question}
+                                                  
+相关技术文档信息:
+{context}
+
+请提供详细、实用的回答。如果信息不足，请诚实说明。
+
+回答:""")
+
+    def _build_context(self, docs: List[Document], query: Optional[str] = None) -> str:
         """
-        构建上下文字符串
-        
+        构建上下文字符串 - 按token预算打包与查询最相关的内容
+
         Args:
             docs: 文档列表
-            max_length: 最大长度
-            
+            query: 用户查询
+
         Returns:
             格式化的上下文字符串
         """
-        if not docs:
-            return "暂无相关技术文档信息。"
-        
-        context_parts = []
-        current_length = 0
-        
-        for i, doc in enumerate(docs, 1):
-            # 添加元数据信息
-            metadata_info = f"【技术文档 {i}】"
-            if 'title' in doc.metadata:
-                metadata_info += f" {doc.metadata['title']}"
-            if 'category' in doc.metadata:
-                metadata_info += f" | 分类: {doc.metadata['category']}"
-            if 'source' in doc.metadata:
-                # 提取文件名作为来源
-                source_file = doc.metadata['source'].split('\\')[-1] if '\\' in doc.metadata['source'] else doc.metadata['source'].split('/')[-1]
-                metadata_info += f" | 来源: {source_file}"
-            
-            # 构建文档文本
-            doc_text = f"{metadata_info}\n{doc.page_content}\n"
-            
-            # 检查长度限制
-            if current_length + len(doc_text) > max_length:
-                break
-            
-            context_parts.append(doc_text)
-            current_length += len(doc_text)
-        
-        return "\n" + "="*80 + "\n".join(context_parts)
\ No newline at end of file
+        return self.context_builder.build(docs, query)
@@ -2,32 +2,76 @@
 索引构建模块
 """
 
+import time
+import random
 import logging
-from typing import List
+from itertools import islice
+from typing import List, Iterable, Dict, Any, Optional, Sequence
 from pathlib import Path
 
+import faiss
+import numpy as np
 from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
+from embedding_cache import EmbeddingCache
+from embedding_engine import EmbeddingEngine
+from mmap_store import (
+    MmapDocstore, LazyDocumentList, has_mmap_index, read_faiss_index, save_mmap_index
+)
+
 logger = logging.getLogger(__name__)
 
 class IndexConstructionModule:
     """
     索引构建模块 - 负责chunk的向量化和索引构建
     """
+    EMBEDDING_CACHE_FILENAME = "embedding_cache.sqlite"
+    INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+    # 各索引类型的默认构建/搜索参数，可通过 index_options 覆盖
+    DEFAULT_INDEX_OPTIONS = {
+        "hnsw_m": 32,               # HNSW每个节点的邻居数
+        "hnsw_ef_construction": 200, # HNSW构建时的搜索宽度
+        "hnsw_ef_search": 64,       # HNSW搜索时的搜索宽度
+        "ivf_nlist": 1024,          # IVF聚类中心数(按训练样本量自动收缩)
+        "ivf_nprobe": 16,           # IVF搜索时探查的聚类数
+        "pq_m": 16,                 # PQ子空间数
+        "pq_nbits": 8,              # PQ每个子空间的编码位数
+        "train_size": 100000        # 训练采样的向量数
+    }
 
-    def __init__(self,model_name: str = "BAAI/bge-small-zh-v1.5",index_save_path: str = "./vector_index"):
+    def __init__(self,model_name: str = "BAAI/bge-small-zh-v1.5",index_save_path: str = "./vector_index",
+                 embedding_batch_size: int = 32, embedding_threads: int = 0,
+                 enable_embedding_cache: bool = True, index_type: str = "flat",
+                 index_options: Optional[Dict[str, Any]] = None, index_mmap: bool = True):
         """
         初始化索引构建模块
 
         Args:
             model_name: 嵌入模型名称
             index_save_path: 索引保存路径
+            embedding_batch_size: 每批嵌入的chunk数量
+            embedding_threads: 嵌入使用的CPU线程数，0表示使用torch默认值
+            enable_embedding_cache: 是否启用持久化嵌入缓存(保存在索引目录下)
+            index_type: FAISS索引类型(flat / hnsw / ivf / ivfpq)
+            index_options: 索引构建和搜索参数，见 DEFAULT_INDEX_OPTIONS
+            index_mmap: 加载索引时是否使用内存映射(多进程共享页缓存)
         """
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型: {index_type}，可选: {', '.join(self.INDEX_TYPES)}")
+
         self.model_name = model_name
         self.index_save_path = index_save_path
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_threads = embedding_threads
+        self.enable_embedding_cache = enable_embedding_cache
+        self.index_type = index_type
+        self.index_options = {**self.DEFAULT_INDEX_OPTIONS, **(index_options or {})}
+        self.index_mmap = index_mmap
         self.embeddings = None
+        self.embedding_engine = None
         self.vectorstore = None
         self.setup_embeddings()
 
@@ -38,7 +82,19 @@ class IndexConstructionModule:
         self.embeddings = HuggingFaceEmbeddings(
             model_name=self.model_name,
             model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': self.embedding_batch_size}
+        )
+        cache = None
+        if self.enable_embedding_cache:
+            cache = EmbeddingCache(
+                str(Path(self.index_save_path) / self.EMBEDDING_CACHE_FILENAME),
+                model_name=self.model_name
+            )
+        self.embedding_engine = EmbeddingEngine(
+            self.embeddings,
+            batch_size=self.embedding_batch_size,
+            num_threads=self.embedding_threads,
+            cache=cache
         )
 
         logger.info("嵌入模型初始化完成")
@@ -58,15 +114,52 @@ class IndexConstructionModule:
         if not chunks:
             raise ValueError("文档块列表不能为空")
         
-        # 构建FAISS向量存储
-        self.vectorstore = FAISS.from_documents(
-            documents=chunks,
-            embedding=self.embeddings
-        )
+        # 构建FAISS向量存储，docstore以确定性的chunk ID为键
+        self._release_vectorstore()
+        self._append_chunks(chunks)
 
         logger.info(f"向量索引构建完成，包含 {len(chunks)} 个向量")
         return self.vectorstore
     
+    def build_vector_index_streaming(self, chunks: Iterable[Document], batch_size: int = 256) -> FAISS:
+        """
+        流式构建向量索引 - 按批嵌入并追加到索引，峰值内存由批大小决定
+
+        Args:
+            chunks: 文档块迭代器(通常来自数据准备模块的 iter_chunks)
+            batch_size: 每批嵌入的文档块数量
+
+        Returns:
+            FAISS向量存储对象
+        """
+        logger.info(f"正在流式构建FAISS向量索引(批大小 {batch_size})...")
+
+        self._release_vectorstore()
+        total = 0
+        chunk_iter = iter(chunks)
+
+        # IVF类索引需要先用样本训练，首批数据攒够训练样本量后再建索引
+        if self.index_type in ("ivf", "ivfpq"):
+            warmup = list(islice(chunk_iter, max(batch_size, self.index_options["train_size"])))
+            if warmup:
+                self._append_chunks(warmup)
+                total += len(warmup)
+                logger.info(f"已写入 {total} 个向量")
+
+        while True:
+            batch = list(islice(chunk_iter, batch_size))
+            if not batch:
+                break
+            self._append_chunks(batch)
+            total += len(batch)
+            logger.info(f"已写入 {total} 个向量")
+
+        if self.vectorstore is None:
+            raise ValueError("文档块列表不能为空")
+
+        logger.info(f"向量索引流式构建完成，包含 {total} 个向量")
+        return self.vectorstore
+
     def add_documents(self,new_chunks: List[Document]):
         """
         向现有索引添加新文档
@@ -78,25 +171,324 @@ class IndexConstructionModule:
             raise ValueError("暂无索引,请先构建向量索引")
 
         logger.info(f"正在添加 {len(new_chunks)} 个新文档到索引...")
-        self.vectorstore.add_documents(new_chunks)
+        self._append_chunks(new_chunks)
         logger.info("新文档添加完成")
 
+    def delete_by_parent_ids(self, parent_ids: List[str]) -> int:
+        """
+        从现有索引中删除指定父文档的所有chunk
+
+        Args:
+            parent_ids: 父文档ID列表
+
+        Returns:
+            删除的chunk数量
+        """
+        if not self.vectorstore:
+            raise ValueError("暂无索引,请先构建向量索引")
+
+        parent_id_set = set(parent_ids)
+        if not parent_id_set:
+            return 0
+
+        chunk_ids = [
+            chunk_id for chunk_id in self.vectorstore.index_to_docstore_id.values()
+            if self.vectorstore.docstore.search(chunk_id).metadata.get("parent_id") in parent_id_set
+        ]
+        return self.delete_chunks(chunk_ids)
+
+    def delete_chunks(self, chunk_ids: List[str]) -> int:
+        """
+        按chunk ID从现有索引中删除chunk
+
+        Args:
+            chunk_ids: chunk ID列表
+
+        Returns:
+            删除的chunk数量
+        """
+        if not self.vectorstore:
+            raise ValueError("暂无索引,请先构建向量索引")
+
+        existing_ids = set(self.vectorstore.index_to_docstore_id.values())
+        chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id in existing_ids]
+        if chunk_ids:
+            logger.info(f"正在从索引中删除 {len(chunk_ids)} 个过期chunk...")
+            self._ensure_writable()
+            # 只有Flat索引删除后会把剩余向量的ID压缩为连续的 0..n-1，与 FAISS.delete 重排的映射一致；
+            # IVF索引的 remove_ids 不重新编号，HNSW不支持删除，两者都改为用剩余chunk重建(向量来自嵌入缓存)
+            index_type = self._detect_index_type(self.vectorstore.index)
+            if index_type == "flat":
+                self.vectorstore.delete(chunk_ids)
+            else:
+                logger.info(f"{index_type}索引无法在保持向量ID连续的前提下删除，将用剩余chunk重建索引")
+                removed = set(chunk_ids)
+                remaining = [chunk for chunk in self.get_all_chunks()
+                             if chunk.metadata.get("chunk_id") not in removed]
+                index = self.vectorstore.index
+                self._release_vectorstore()
+                if remaining:
+                    self._append_chunks(remaining)
+                else:
+                    # 全部chunk都被删除时保留已训练的空索引，后续仍可追加新chunk和保存
+                    index.reset()
+                    self.vectorstore = FAISS(
+                        embedding_function=self.embeddings,
+                        index=index,
+                        docstore=InMemoryDocstore(),
+                        index_to_docstore_id={}
+                    )
+        return len(chunk_ids)
+
+    def update_chunk_metadata(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """
+        更新索引中已有chunk的元数据(如去重时归并到规范chunk的重复来源)
+
+        Args:
+            updates: chunk ID到需要写入的元数据字段的映射
+
+        Returns:
+            更新的chunk数量
+        """
+        if not self.vectorstore:
+            raise ValueError("暂无索引,请先构建向量索引")
+
+        existing_ids = set(self.vectorstore.index_to_docstore_id.values())
+        updates = {chunk_id: metadata for chunk_id, metadata in updates.items() if chunk_id in existing_ids}
+        if not updates:
+            return 0
+
+        self._ensure_writable()
+        for chunk_id, metadata in updates.items():
+            self.vectorstore.docstore.search(chunk_id).metadata.update(metadata)
+        logger.info(f"已更新 {len(updates)} 个chunk的元数据")
+        return len(updates)
+
+    def get_all_chunks(self) -> Sequence[Document]:
+        """
+        获取索引中保存的全部chunk(按向量位置排序)
+
+        Returns:
+            文档块序列，内存映射加载时为按需解析的只读序列
+        """
+        if not self.vectorstore:
+            raise ValueError("暂无索引,请先构建向量索引")
+
+        if isinstance(self.vectorstore.docstore, MmapDocstore):
+            return LazyDocumentList(self.vectorstore.docstore)
+
+        index_to_id = self.vectorstore.index_to_docstore_id
+        return [self.vectorstore.docstore.search(index_to_id[i]) for i in sorted(index_to_id)]
+
+    def _append_chunks(self, chunks: List[Document]):
+        """
+        通过嵌入引擎批量嵌入chunk并写入索引，索引不存在时新建
+
+        Args:
+            chunks: 文档块列表
+        """
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = self.embedding_engine.embed_documents(texts)
+        text_embeddings = list(zip(texts, vectors))
+        metadatas = [chunk.metadata for chunk in chunks]
+        ids = self._chunk_ids(chunks)
+
+        if self.vectorstore is not None:
+            self._ensure_writable()
+        else:
+            self.vectorstore = FAISS(
+                embedding_function=self.embeddings,
+                index=self._create_faiss_index(np.asarray(vectors, dtype=np.float32)),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={}
+            )
+        self.vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+    def _ensure_writable(self):
+        """
+        修改索引前，将内存映射加载的只读索引和docstore转换为可写的内存副本
+        """
+        docstore = self.vectorstore.docstore
+        if not isinstance(docstore, MmapDocstore):
+            return
+
+        logger.info("正在将内存映射索引转换为可写的内存索引...")
+        memory_docstore = InMemoryDocstore({
+            chunk_id: docstore.get_by_position(i) for i, chunk_id in enumerate(docstore.chunk_ids)
+        })
+        index = read_faiss_index(self.index_save_path, use_mmap=False)
+        self._apply_search_params(index)
+        index_to_docstore_id = dict(self.vectorstore.index_to_docstore_id)
+        # 关闭映射文件并丢弃映射加载的索引，之后保存时才能替换这些文件(Windows上被映射的文件无法替换)
+        self._release_vectorstore()
+        self.vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=memory_docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+
+    def _release_vectorstore(self):
+        """释放当前向量存储，内存映射加载时关闭docstore的映射文件"""
+        if self.vectorstore is not None and isinstance(self.vectorstore.docstore, MmapDocstore):
+            self.vectorstore.docstore.close()
+        self.vectorstore = None
+
+    def _create_faiss_index(self, vectors: np.ndarray) -> "faiss.Index":
+        """
+        按配置的索引类型创建FAISS索引，需要训练的索引使用采样向量训练
+
+        Args:
+            vectors: 首批向量，用于确定维度和训练
+
+        Returns:
+            空的FAISS索引(已训练)
+        """
+        n, dim = vectors.shape
+        options = self.index_options
+
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, options["hnsw_m"])
+            index.hnsw.efConstruction = options["hnsw_ef_construction"]
+        elif self.index_type in ("ivf", "ivfpq"):
+            train_vectors = vectors
+            if n > options["train_size"]:
+                sample = np.random.default_rng(0).choice(n, options["train_size"], replace=False)
+                train_vectors = vectors[sample]
+
+            # 每个聚类中心至少需要约39个训练样本
+            nlist = max(1, min(options["ivf_nlist"], len(train_vectors) // 39))
+            quantizer = faiss.IndexFlatL2(dim)
+            pq_m = self._pq_subquantizers(dim, options["pq_m"])
+            if self.index_type == "ivfpq" and len(train_vectors) >= (1 << options["pq_nbits"]):
+                index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, options["pq_nbits"])
+            else:
+                if self.index_type == "ivfpq":
+                    logger.warning(f"训练样本({len(train_vectors)})不足以训练PQ编码，退化为IVF-Flat")
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+
+            logger.info(f"正在训练 {self.index_type} 索引(nlist={nlist}, 样本数={len(train_vectors)})...")
+            index.train(train_vectors)
+        else:
+            index = faiss.IndexFlatL2(dim)
+
+        self._apply_search_params(index)
+        return index
+
+    @staticmethod
+    def _pq_subquantizers(dim: int, pq_m: int) -> int:
+        """PQ子空间数必须整除向量维度，取不超过配置值的最大约数"""
+        for m in range(min(pq_m, dim), 0, -1):
+            if dim % m == 0:
+                return m
+        return 1
+
+    def _apply_search_params(self, index: "faiss.Index"):
+        """设置搜索时参数(HNSW的efSearch / IVF的nprobe)"""
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.index_options["hnsw_ef_search"]
+            return
+        try:
+            ivf_index = faiss.extract_index_ivf(index)
+        except RuntimeError:
+            return
+        ivf_index.nprobe = min(self.index_options["ivf_nprobe"], ivf_index.nlist)
+
+    @staticmethod
+    def _detect_index_type(index: "faiss.Index") -> str:
+        """识别FAISS索引的类型"""
+        if isinstance(index, faiss.IndexHNSW):
+            return "hnsw"
+        try:
+            # extract_index_ivf 返回的是 IndexIVF 基类包装，需要向下转换后才能区分IVF-PQ
+            ivf_index = faiss.downcast_index(faiss.extract_index_ivf(index))
+        except RuntimeError:
+            return "flat"
+        return "ivfpq" if isinstance(ivf_index, faiss.IndexIVFPQ) else "ivf"
+
+    def _index_type_matches(self, loaded_type: str) -> bool:
+        """已保存的索引类型是否符合配置 - 训练样本不足时ivfpq会退化为IVF-Flat构建，同样视为符合"""
+        return loaded_type == self.index_type or (self.index_type == "ivfpq" and loaded_type == "ivf")
+
+    def evaluate_index(self, queries: Optional[List[str]] = None, k: int = 10,
+                       sample_size: int = 200) -> Dict[str, Any]:
+        """
+        评估当前ANN索引相对精确(Flat)检索的召回率和延迟
+
+        Args:
+            queries: 评估用查询，为None时从chunk中采样文本片段作为查询
+            k: 每个查询返回的结果数
+            sample_size: 自动采样查询的数量
+
+        Returns:
+            评估报告字典
+        """
+        if not self.vectorstore:
+            raise ValueError("请先构建或加载向量索引")
+
+        chunks = self.get_all_chunks()
+        if queries is None:
+            sampled = random.Random(0).sample(chunks, min(sample_size, len(chunks)))
+            queries = [chunk.page_content[:100] for chunk in sampled]
+
+        # 基准向量取自嵌入缓存，查询向量实时计算
+        base = np.asarray(self.embedding_engine.embed_documents([chunk.page_content for chunk in chunks]),
+                          dtype=np.float32)
+        query_vectors = np.asarray(self.embeddings.embed_documents(queries), dtype=np.float32)
+
+        flat_index = faiss.IndexFlatL2(base.shape[1])
+        flat_index.add(base)
+
+        start_time = time.perf_counter()
+        _, exact_ids = flat_index.search(query_vectors, k)
+        flat_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        _, ann_ids = self.vectorstore.index.search(query_vectors, k)
+        ann_seconds = time.perf_counter() - start_time
+
+        recalls = [
+            len(set(exact[exact >= 0]) & set(ann[ann >= 0])) / max(1, int((exact >= 0).sum()))
+            for exact, ann in zip(exact_ids, ann_ids)
+        ]
+        report = {
+            "index_type": self._detect_index_type(self.vectorstore.index),
+            "vectors": int(base.shape[0]),
+            "queries": len(queries),
+            "k": k,
+            f"recall@{k}": float(np.mean(recalls)),
+            "ann_latency_ms": ann_seconds * 1000 / len(queries),
+            "flat_latency_ms": flat_seconds * 1000 / len(queries),
+            "speedup": flat_seconds / ann_seconds if ann_seconds else 0.0
+        }
+        logger.info(f"索引评估报告: {report}")
+        return report
+
+    @staticmethod
+    def _chunk_ids(chunks: List[Document]) -> List[str]:
+        """取出chunk的确定性ID，作为FAISS docstore的键"""
+        missing = [chunk for chunk in chunks if not chunk.metadata.get("chunk_id")]
+        if missing:
+            raise ValueError(f"有 {len(missing)} 个文档块缺少chunk_id，请通过数据准备模块分块")
+        return [chunk.metadata["chunk_id"] for chunk in chunks]
+
     def save_index(self):
         """
-        持久化向量索引 - 保存到指定的路径下
+        持久化向量索引 - 以内存映射格式保存到指定的路径下
         """
         if not self.vectorstore:
             raise ValueError("暂无索引,请先构建向量索引")
         
-        # 确保保存目录存在
-        Path(self.index_save_path).mkdir(parents=True, exist_ok=True)
-
-        self.vectorstore.save_local(self.index_save_path)
+        # 保存会替换当前映射的文件，先转换为内存副本
+        self._ensure_writable()
+        index_to_id = self.vectorstore.index_to_docstore_id
+        chunk_ids = [index_to_id[i] for i in sorted(index_to_id)]
+        save_mmap_index(self.index_save_path, self.vectorstore.index, chunk_ids, self.get_all_chunks())
         logger.info(f"向量索引已保存到: {self.index_save_path}")
 
     def load_index(self):
         """
-        从配置的路径加载向量索引
+        从配置的路径加载向量索引 - 优先使用内存映射格式，兼容旧版 save_local 格式
 
         Returns:
             加载的向量存储对象，如果加载失败返回None
@@ -108,16 +500,33 @@ class IndexConstructionModule:
             logger.info(f"索引路径不存在: {self.index_save_path}，将构建新索引")
             return None
 
+        self._release_vectorstore()
         try:
-            self.vectorstore = FAISS.load_local(
-                self.index_save_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
+            if has_mmap_index(self.index_save_path):
+                docstore = MmapDocstore(self.index_save_path)
+                self.vectorstore = FAISS(
+                    embedding_function=self.embeddings,
+                    index=read_faiss_index(self.index_save_path, use_mmap=self.index_mmap),
+                    docstore=docstore,
+                    index_to_docstore_id=dict(enumerate(docstore.chunk_ids))
+                )
+            else:
+                self.vectorstore = FAISS.load_local(
+                    self.index_save_path,
+                    self.embeddings,
+                    allow_dangerous_deserialization=True
+                )
+            loaded_type = self._detect_index_type(self.vectorstore.index)
+            if not self._index_type_matches(loaded_type):
+                logger.info(f"已保存索引类型为 {loaded_type}，与配置的 {self.index_type} 不一致，将重建索引")
+                self._release_vectorstore()
+                return None
+            self._apply_search_params(self.vectorstore.index)
             logger.info(f"向量索引已从 {self.index_save_path} 加载")
             return self.vectorstore
         except Exception as e:
             logger.warning(f"加载向量索引失败: {e}，将构建新索引")
+            self._release_vectorstore()
             return None
     
     def similarity_search(self, query: str, k: int = 5) -> List[Document]:
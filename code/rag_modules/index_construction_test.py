@@ -0,0 +1,115 @@
+"""
+索引构建模块测试程序
+测试各类FAISS索引的增量更新、保存和加载(使用确定性的假嵌入，无需下载模型)
+"""
+import os
+import sys
+import hashlib
+import tempfile
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# 添加模块路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from embedding_engine import EmbeddingEngine
+from index_construction import IndexConstructionModule
+
+DIM = 32
+
+
+class HashEmbeddings(Embeddings):
+    """按文本哈希生成的确定性单位向量"""
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(DIM)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class FakeIndexConstructionModule(IndexConstructionModule):
+    """使用假嵌入的索引构建模块"""
+
+    def setup_embeddings(self):
+        self.embeddings = HashEmbeddings()
+        self.embedding_engine = EmbeddingEngine(self.embeddings, batch_size=self.embedding_batch_size)
+
+
+def make_chunks(parent_id: str, count: int, version: str = "v1") -> List[Document]:
+    """生成属于同一父文档的测试chunk"""
+    return [
+        Document(
+            page_content=f"{parent_id} {version} 第{i}段内容",
+            metadata={"chunk_id": f"{parent_id}-{version}-{i}", "parent_id": parent_id}
+        )
+        for i in range(count)
+    ]
+
+
+def make_module(index_path: str, index_type: str) -> FakeIndexConstructionModule:
+    # 小样本下IVF/PQ也能训练
+    options = {"ivf_nlist": 4, "pq_m": 4, "pq_nbits": 4, "train_size": 1000}
+    return FakeIndexConstructionModule(
+        index_save_path=index_path, enable_embedding_cache=False, index_type=index_type, index_options=options
+    )
+
+
+def test_incremental_replace_all_hnsw():
+    """所有源文件都被修改时，HNSW索引删除全部chunk后仍可追加新chunk并保存"""
+    with tempfile.TemporaryDirectory() as index_path:
+        module = make_module(index_path, "hnsw")
+        module.build_vector_index(make_chunks("a", 5) + make_chunks("b", 5))
+        module.save_index()
+        assert module.load_index() is not None
+
+        # 与增量更新一致：先删除被修改文件的旧chunk，再写入重新分块的结果
+        assert module.delete_by_parent_ids(["a", "b"]) == 10
+        assert module.vectorstore is not None
+        assert len(module.get_all_chunks()) == 0
+
+        new_chunks = make_chunks("a", 3, "v2") + make_chunks("b", 4, "v2")
+        module.add_documents(new_chunks)
+        module.save_index()
+
+        assert module.load_index() is not None
+        assert module._detect_index_type(module.vectorstore.index) == "hnsw"
+        chunk_ids = [chunk.metadata["chunk_id"] for chunk in module.get_all_chunks()]
+        assert chunk_ids == [chunk.metadata["chunk_id"] for chunk in new_chunks]
+        assert module.similarity_search(new_chunks[0].page_content, k=1)[0].page_content == new_chunks[0].page_content
+
+
+def test_detect_index_type_after_save_and_load():
+    """各类索引保存并加载后都能识别出正确的类型，类型与配置不一致时加载返回None以触发重建"""
+    # IVF每个聚类中心需要约39个训练样本，PQ(4位)需要至少16个
+    chunks = make_chunks("a", 200)
+    for index_type in IndexConstructionModule.INDEX_TYPES:
+        with tempfile.TemporaryDirectory() as index_path:
+            module = make_module(index_path, index_type)
+            module.build_vector_index(chunks)
+            assert module._detect_index_type(module.vectorstore.index) == index_type
+            assert module.evaluate_index(k=5, sample_size=10)["index_type"] == index_type
+            module.save_index()
+
+            assert module.load_index() is not None, index_type
+            assert module._detect_index_type(module.vectorstore.index) == index_type
+            module._release_vectorstore()
+
+            for other_type in IndexConstructionModule.INDEX_TYPES:
+                # 配置为ivfpq时接受训练样本不足而退化构建的IVF-Flat索引
+                if other_type != index_type and (index_type, other_type) != ("ivf", "ivfpq"):
+                    assert make_module(index_path, other_type).load_index() is None, (index_type, other_type)
+
+
+if __name__ == "__main__":
+    test_incremental_replace_all_hnsw()
+    test_detect_index_type_after_save_and_load()
+    print("✅ 索引构建模块测试通过")
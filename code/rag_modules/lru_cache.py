@@ -0,0 +1,120 @@
+"""
+LRU缓存模块
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+class TTLLRUCache:
+    """线程安全的LRU缓存 - 同时按条目数量和存活时间(TTL)淘汰"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目存活秒数，为None或<=0时不过期
+        """
+        self.max_size = max(1, max_size)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        读取缓存条目，命中时将其移到最近使用位置
+
+        Args:
+            key: 缓存键
+            default: 未命中时的返回值
+
+        Returns:
+            缓存值或default
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        """
+        写入缓存条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        读取缓存条目，未命中时调用compute计算并写入
+
+        Args:
+            key: 缓存键
+            compute: 计算缓存值的函数(在锁外执行)
+
+        Returns:
+            缓存值
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """移除并返回缓存条目"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[0] if item is not None else default
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """返回未过期条目的快照(不影响LRU顺序和命中统计)"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (value, expires_at) in self._data.items()
+                    if expires_at is None or expires_at > now]
+
+    def clear(self):
+        """清空缓存(保留命中统计)"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典
+        """
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
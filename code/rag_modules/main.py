@@ -4,20 +4,27 @@
 
 import os
 import sys
+import asyncio
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Optional
 
 # 添加模块路径
 sys.path.append(str(Path(__file__).parent))
 
 from dotenv import load_dotenv
+from langchain_core.documents import Document
 from config import DEFAULT_CONFIG, RAGConfig
 from data_preparation import DataPreparationModule
 from index_construction import IndexConstructionModule
 from retrieval_optimization import RetrievalOptimizationModule
 from generation_intergration import GenerationIntegrationModule
+from answer_cache import AnswerCache
+from reranker import CrossEncoderReranker
+from dedup import ChunkDeduplicator, duplicate_closure
 
 # 加载环境变量
 load_dotenv()
@@ -43,6 +50,14 @@ class ProgrammerHelperRAGSystem:
         self.index_module = None
         self.retrieval_module = None
         self.generation_module = None
+        self.answer_cache = None
+        self.reranker = None
+        self.deduplicator = None
+        # 推测检索时在后台线程执行查询重写
+        self.rewrite_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-rewrite")
+        self.speculation_stats = {'reused': 0, 'retrieved_again': 0}
+        # 推测检索统计会在并发的批量/异步查询中更新
+        self._stats_lock = threading.Lock()
         
         # 系统状态
         self.is_initialized = False
@@ -82,23 +97,67 @@ class ProgrammerHelperRAGSystem:
             # 1. 初始化数据准备模块
             print("📚 初始化数据准备模块...")
             self.data_module = DataPreparationModule()
-            self.data_module(self.config.data_path)
+            self.data_module(
+                self.config.data_path,
+                manifest_path=str(Path(self.config.index_save_path) / DataPreparationModule.MANIFEST_FILENAME),
+                workers=self.config.workers,
+                parent_cache_size=self.config.parent_cache_size
+            )
             
             # 2. 初始化索引构建模块
             print("🔍 初始化索引构建模块...")
             self.index_module = IndexConstructionModule(
                 model_name=self.config.embedding_model,
-                index_save_path=self.config.index_save_path
+                index_save_path=self.config.index_save_path,
+                embedding_batch_size=self.config.embedding_batch_size,
+                embedding_threads=self.config.embedding_threads,
+                enable_embedding_cache=self.config.enable_embedding_cache,
+                index_type=self.config.index_type,
+                index_options=self.config.get_index_options(),
+                index_mmap=self.config.index_mmap
             )
 
+            # chunk去重 - 位于分块和构建向量索引之间，重复内容只嵌入和索引一次
+            if self.config.enable_dedup:
+                self.deduplicator = ChunkDeduplicator(
+                    near_duplicate=self.config.dedup_near_duplicates,
+                    threshold=self.config.dedup_threshold,
+                    num_perm=self.config.dedup_num_perm,
+                    bands=self.config.dedup_bands,
+                    min_length=self.config.dedup_min_length
+                )
+                self.deduplicator.load(self._dedup_path())
+
             # 3. 初始化生成集成模块
             print("🤖 初始化生成集成模块...")
             self.generation_module = GenerationIntegrationModule(
                 model_name=self.config.llm_model,
                 temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
+                max_tokens=self.config.max_tokens,
+                rewrite_cache_size=self.config.rewrite_cache_size,
+                rewrite_cache_ttl=self.config.rewrite_cache_ttl,
+                enable_rewrite_classifier=self.config.enable_rewrite_classifier,
+                rewrite_min_length=self.config.rewrite_min_length,
+                context_max_tokens=self.config.context_max_tokens,
+                context_tokenizer=self.config.bm25_tokenizer
             )
 
+            # 重排序模型只加载一次，索引重建后继续复用(分数缓存按chunk ID区分内容)
+            if self.config.enable_rerank:
+                print("🎯 加载重排序模型...")
+                self.reranker = CrossEncoderReranker(
+                    model_name=self.config.rerank_model,
+                    batch_size=self.config.rerank_batch_size,
+                    max_length=self.config.rerank_max_length,
+                    latency_budget_ms=self.config.rerank_latency_budget_ms,
+                    min_candidates=self.config.rerank_min_candidates,
+                    max_candidates=self.config.rerank_max_candidates,
+                    min_score=self.config.rerank_min_score,
+                    cache_size=self.config.rerank_cache_size
+                )
+                if not self.reranker.load():
+                    print("⚠️ 重排序模型不可用，使用融合排序结果")
+
             # 4. 加载或构建索引
             print("📖 加载文档和构建索引...")
             self._load_documents_and_build_index(force_rebuild)
@@ -114,7 +173,72 @@ class ProgrammerHelperRAGSystem:
 
     def _load_documents_and_build_index(self, force_rebuild: bool = False):
         """加载文档并构建索引"""
-        # 无论是否有现有索引，都需要加载文档数据到内存
+        # 已有索引和摄取清单时，只处理新增、修改和删除的文档
+        if (not force_rebuild and self.data_module.has_manifest()
+                and self.index_module.load_index()):
+            print("✅ 成功加载现有向量索引")
+            self._update_index_incrementally()
+        else:
+            self._build_index_from_scratch()
+
+        # 初始化检索优化模块
+        print("⚡ 初始化检索优化模块...")
+        self.retrieval_module = RetrievalOptimizationModule(
+            vectorstore=self.index_module.vectorstore,
+            chunks=self.chunks,
+            query_cache_size=self.config.query_cache_size,
+            query_cache_ttl=self.config.query_cache_ttl,
+            bm25_path=str(Path(self.config.index_save_path) / RetrievalOptimizationModule.BM25_FILENAME),
+            corpus_version=self.data_module.manifest_digest(),
+            bm25_tokenizer=self.config.bm25_tokenizer,
+            vector_candidate_factor=self.config.vector_candidate_factor,
+            bm25_candidate_factor=self.config.bm25_candidate_factor,
+            min_candidate_k=self.config.min_candidate_k,
+            max_candidate_k=self.config.max_candidate_k,
+            filter_candidate_factor=self.config.filter_candidate_factor,
+            metadata_index_path=str(Path(self.config.index_save_path) / RetrievalOptimizationModule.METADATA_INDEX_FILENAME),
+            prefilter_bruteforce_limit=self.config.prefilter_bruteforce_limit,
+            parallel_hybrid=self.config.parallel_hybrid,
+            retriever_timeout=self.config.retriever_timeout,
+            retrieval_workers=self.config.retrieval_workers if self.config.retrieval_workers > 0
+            else 2 * self.config.batch_max_concurrency,
+            fusion_strategy=self.config.fusion_strategy,
+            vector_weight=self.config.vector_weight,
+            bm25_weight=self.config.bm25_weight,
+            rrf_k=self.config.rrf_k,
+            reranker=self.reranker,
+            enable_diversity=self.config.enable_diversity,
+            simhash_path=str(Path(self.config.index_save_path) / RetrievalOptimizationModule.SIMHASH_FILENAME),
+            diversity_candidate_factor=self.config.diversity_candidate_factor,
+            mmr_lambda=self.config.mmr_lambda,
+            simhash_max_distance=self.config.simhash_max_distance
+        )
+
+        # 查询重写预分类使用有区分度的词: 至少出现在两个chunk里，但不超过一定比例的chunk(排除java这类泛词)
+        if self.generation_module:
+            max_doc_freq = max(2, int(self.config.rewrite_max_term_df * len(self.chunks)))
+            self.generation_module.set_vocabulary(
+                self.retrieval_module.bm25_index.get_vocabulary(min_doc_freq=2, max_doc_freq=max_doc_freq),
+                category_keywords=DataPreparationModule.get_supported_categories()
+            )
+
+        # 回答缓存跨索引重建保留，按索引版本失效
+        if self.config.enable_answer_cache and self.answer_cache is None:
+            self.answer_cache = AnswerCache(
+                embed_function=self.retrieval_module.embed_query,
+                max_size=self.config.answer_cache_size,
+                ttl=self.config.answer_cache_ttl,
+                similarity_threshold=self.config.answer_cache_similarity
+            )
+        elif self.answer_cache is not None:
+            self.answer_cache.embed_function = self.retrieval_module.embed_query
+
+    def _build_index_from_scratch(self):
+        """全量加载文档并重建向量索引"""
+        if self.config.streaming_ingest:
+            self._build_index_streaming()
+            return
+
         print("📄 开始加载技术文档...")
         
         # 加载文档
@@ -125,25 +249,96 @@ class ProgrammerHelperRAGSystem:
         print("✂️ 开始文档分块...")
         self.chunks = self.data_module.chunk_documents()
         print(f"📦 成功分割为 {len(self.chunks)} 个文档块")
+
+        if self.deduplicator:
+            self.chunks = self.deduplicator.deduplicate(self.chunks)
+            print(f"🧹 去重后保留 {len(self.chunks)} 个文档块")
         
-        # 尝试加载现有索引
-        if not force_rebuild and self.index_module.load_index():
-            print("✅ 成功加载现有向量索引")
-        else:
-            # 构建向量索引
-            print("🔗 开始构建向量索引...")
-            self.index_module.build_vector_index(self.chunks)
-            
-            # 保存索引
+        # 构建向量索引
+        print("🔗 开始构建向量索引...")
+        self.index_module.build_vector_index(self.chunks)
+        
+        # 保存索引，索引落盘后再保存摄取清单
+        print("💾 保存向量索引...")
+        self.index_module.save_index()
+        self.data_module.save_manifest()
+        self._save_dedup_signatures()
+
+        # 父文档正文不再常驻内存，需要时由父文档存储按需读取
+        self.data_module.release_documents()
+        self.documents = []
+
+    def _build_index_streaming(self):
+        """流式全量构建向量索引 - 文档和chunk不在内存中整体保留"""
+        print("🌊 开始流式加载、分块并构建向量索引...")
+        batch_size = self.config.ingest_batch_size
+        chunk_stream = self.data_module.iter_chunks(self.data_module.iter_documents())
+        if self.deduplicator:
+            chunk_stream = self.deduplicator.iter_unique(chunk_stream)
+        self.index_module.build_vector_index_streaming(chunk_stream, batch_size=batch_size)
+        if self.deduplicator:
+            # 规范chunk写入索引后才出现的重复来源需要回写到索引的元数据中
+            self.index_module.update_chunk_metadata(self.deduplicator.merged)
+
+        print("💾 保存向量索引...")
+        self.index_module.save_index()
+        self.data_module.save_manifest()
+        self._save_dedup_signatures()
+
+        self.documents = []
+        self.chunks = self.index_module.get_all_chunks()
+        print(f"📦 索引中共有 {len(self.chunks)} 个文档块")
+
+    def _update_index_incrementally(self):
+        """根据摄取清单增量更新已加载的向量索引"""
+        print("📄 开始增量扫描技术文档...")
+        self.documents = self.data_module.load_changed_documents()
+
+        if self.data_module.has_changes():
+            stale_parent_ids = set(self.data_module.stale_parent_ids)
+            if self.deduplicator:
+                # 规范chunk与归并到它的重复来源整组重新分块: 规范chunk所在文档变化时，
+                # 重复来源需要重新提供该内容；重复来源变化时，规范chunk的来源列表需要更新
+                affected = duplicate_closure(self.index_module.get_all_chunks(), stale_parent_ids)
+                extra_documents = self.data_module.add_parent_documents(affected - stale_parent_ids)
+                if extra_documents:
+                    print(f"🔗 {len(extra_documents)} 个未变化的文档与变化的文档共享重复内容，一并重新分块")
+                stale_parent_ids = affected
+
+            removed = self.index_module.delete_by_parent_ids(list(stale_parent_ids))
+            new_chunks = self.data_module.chunk_documents() if self.data_module.documents else []
+            if self.deduplicator and new_chunks:
+                new_chunks = self.deduplicator.deduplicate(new_chunks, existing=self.index_module.get_all_chunks())
+                self.index_module.update_chunk_metadata(self.deduplicator.merged)
+            if new_chunks:
+                self.index_module.add_documents(new_chunks)
+            print(f"🔄 增量更新索引: 新增 {len(new_chunks)} 个文档块, 移除 {removed} 个文档块")
+
             print("💾 保存向量索引...")
             self.index_module.save_index()
-        
-        # 初始化检索优化模块
-        print("⚡ 初始化检索优化模块...")
-        self.retrieval_module = RetrievalOptimizationModule(
-            vectorstore=self.index_module.vectorstore,
-            chunks=self.chunks
-        )
+            self.data_module.save_manifest()
+            self._save_dedup_signatures()
+        else:
+            print("✅ 技术文档无变化，跳过加载和分块")
+            if self.data_module.has_manifest_updates():
+                # 内容哈希未变只有文件信息变化时，清单与索引仍一致，直接保存以免每次启动重新哈希这些文件
+                self.data_module.save_manifest()
+
+        self.data_module.release_documents()
+        self.documents = []
+
+        # 检索所需的全部chunk直接取自索引的docstore
+        self.chunks = self.index_module.get_all_chunks()
+        print(f"📦 索引中共有 {len(self.chunks)} 个文档块")
+
+    def _dedup_path(self) -> str:
+        """MinHash签名的持久化路径"""
+        return str(Path(self.config.index_save_path) / ChunkDeduplicator.SIGNATURES_FILENAME)
+
+    def _save_dedup_signatures(self):
+        """索引落盘后保存去重签名，下次增量更新时无需重新计算已有chunk的签名"""
+        if self.deduplicator:
+            self.deduplicator.save(self._dedup_path())
 
     def query(self, question: str, use_rewrite: bool = None) -> str:
         """
@@ -166,28 +361,17 @@ class ProgrammerHelperRAGSystem:
             use_rewrite = self.config.enable_query_rewrite
             
         try:
-            # 查询重写（可选）
+            # 热门问题直接返回缓存的回答
+            cached_answer = self._get_cached_answer(question)
+            if cached_answer is not None:
+                print(f"⚡ 命中回答缓存，耗时 {time.time() - start_time:.2f} 秒")
+                return cached_answer
+
+            # 查询重写（可选）并检索相关文档
             if use_rewrite:
                 print("🔄 正在分析并优化查询...")
-                rewritten_query = self.generation_module.query_rewrite(question)
-                query_to_use = rewritten_query
-            else:
-                query_to_use = question
-            
-            # 检索相关文档
             print("🔍 正在检索相关技术文档...")
-            if self.retrieval_module:
-                # 使用混合检索
-                relevant_docs = self.retrieval_module.hybrid_search(
-                    query_to_use, 
-                    top_k=self.config.top_k
-                )
-            else:
-                # 使用基础相似度检索
-                relevant_docs = self.index_module.similarity_search(
-                    query_to_use,
-                    k=self.config.top_k
-                )
+            relevant_docs = self._retrieve_documents(question, use_rewrite)
             
             print(f"📋 找到 {len(relevant_docs)} 个相关文档")
             
@@ -198,6 +382,8 @@ class ProgrammerHelperRAGSystem:
                 context_docs=relevant_docs
             )
             
+            self._cache_answer(question, answer)
+
             elapsed_time = time.time() - start_time
             print(f"⏱️ 查询完成，耗时 {elapsed_time:.2f} 秒")
             
@@ -228,35 +414,298 @@ class ProgrammerHelperRAGSystem:
             use_rewrite = self.config.enable_query_rewrite
             
         try:
-            # 查询重写（可选）
-            if use_rewrite:
-                rewritten_query = self.generation_module.query_rewrite(question)
-                query_to_use = rewritten_query
-            else:
-                query_to_use = question
-            
-            # 检索相关文档
-            if self.retrieval_module:
-                relevant_docs = self.retrieval_module.hybrid_search(
-                    query_to_use, 
-                    top_k=self.config.top_k
-                )
-            else:
-                relevant_docs = self.index_module.similarity_search(
-                    query_to_use,
-                    k=self.config.top_k
-                )
+            # 热门问题直接返回缓存的回答
+            cached_answer = self._get_cached_answer(question)
+            if cached_answer is not None:
+                yield cached_answer
+                return
+
+            # 查询重写（可选）并检索相关文档
+            relevant_docs = self._retrieve_documents(question, use_rewrite)
             
-            # 流式生成回答
+            # 流式生成回答，完整输出后写入回答缓存
+            answer_parts = []
             for chunk in self.generation_module.generate_basic_answer_stream(
                 query=question,
                 context_docs=relevant_docs
             ):
+                answer_parts.append(chunk)
                 yield chunk
+            self._cache_answer(question, "".join(answer_parts))
                 
         except Exception as e:
             yield f"抱歉，查询过程中出现错误: {str(e)}"
 
+    async def aquery(self, question: str, use_rewrite: bool = None) -> str:
+        """
+        查询问答 - 异步版本，LLM调用使用异步接口，检索等CPU密集步骤放到线程池执行
+
+        Args:
+            question: 用户问题
+            use_rewrite: 是否使用查询重写，默认使用配置值
+
+        Returns:
+            回答结果
+        """
+        if not self.is_initialized:
+            raise RuntimeError("系统尚未初始化，请先调用 initialize_system()")
+
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+
+        # 是否使用查询重写
+        if use_rewrite is None:
+            use_rewrite = self.config.enable_query_rewrite
+
+        try:
+            # 热门问题直接返回缓存的回答(查找时可能需要计算问题向量)
+            cached_answer = await loop.run_in_executor(None, self._get_cached_answer, question)
+            if cached_answer is not None:
+                return cached_answer
+
+            # 查询重写（可选）并检索相关文档
+            relevant_docs = await self._aretrieve_documents(question, use_rewrite)
+
+            # 生成回答
+            answer = await self.generation_module.agenerate_basic_answer(
+                query=question,  # 使用原始问题生成回答
+                context_docs=relevant_docs
+            )
+
+            await loop.run_in_executor(None, self._cache_answer, question, answer)
+
+            self.logger.info(f"查询成功: {question[:50]}... -> 返回答案长度: {len(answer)}, "
+                             f"耗时 {time.time() - start_time:.2f} 秒")
+            return answer
+
+        except Exception as e:
+            self.logger.error(f"查询失败: {e}")
+            return f"抱歉，查询过程中出现错误: {str(e)}"
+
+    async def aquery_stream(self, question: str, use_rewrite: bool = None) -> AsyncIterator[str]:
+        """
+        流式查询问答 - 异步版本
+
+        Args:
+            question: 用户问题
+            use_rewrite: 是否使用查询重写
+
+        Yields:
+            回答片段
+        """
+        if not self.is_initialized:
+            raise RuntimeError("系统尚未初始化，请先调用 initialize_system()")
+
+        loop = asyncio.get_running_loop()
+
+        # 是否使用查询重写
+        if use_rewrite is None:
+            use_rewrite = self.config.enable_query_rewrite
+
+        try:
+            # 热门问题直接返回缓存的回答
+            cached_answer = await loop.run_in_executor(None, self._get_cached_answer, question)
+            if cached_answer is not None:
+                yield cached_answer
+                return
+
+            # 查询重写（可选）并检索相关文档
+            relevant_docs = await self._aretrieve_documents(question, use_rewrite)
+
+            # 流式生成回答，完整输出后写入回答缓存
+            answer_parts = []
+            async for chunk in self.generation_module.agenerate_basic_answer_stream(
+                query=question,
+                context_docs=relevant_docs
+            ):
+                answer_parts.append(chunk)
+                yield chunk
+            await loop.run_in_executor(None, self._cache_answer, question, "".join(answer_parts))
+
+        except Exception as e:
+            yield f"抱歉，查询过程中出现错误: {str(e)}"
+
+    def query_batch(self, questions: List[str], use_rewrite: bool = None) -> List[str]:
+        """
+        批量问答 - 查询重写和回答生成并发请求LLM，检索一次批量完成，适合离线生成题库答案
+
+        Args:
+            questions: 用户问题列表
+            use_rewrite: 是否使用查询重写，默认使用配置值
+
+        Returns:
+            与questions顺序一致的回答列表
+        """
+        if not self.is_initialized:
+            raise RuntimeError("系统尚未初始化，请先调用 initialize_system()")
+
+        if not questions:
+            return []
+
+        start_time = time.time()
+
+        # 是否使用查询重写
+        if use_rewrite is None:
+            use_rewrite = self.config.enable_query_rewrite
+
+        # 近似匹配和写入回答缓存都需要问题向量，先一次前向计算批量嵌入全部问题，之后逐条查找时命中查询向量缓存
+        if self.answer_cache and self.answer_cache.uses_embeddings and self.retrieval_module:
+            self.retrieval_module.embed_queries(questions)
+
+        # 命中回答缓存的问题不再进入检索和生成
+        answers: List[Optional[str]] = [self._get_cached_answer(question) for question in questions]
+        pending = [i for i, answer in enumerate(answers) if answer is None]
+        if not pending:
+            return answers
+        all_questions, questions = questions, [questions[i] for i in pending]
+
+        try:
+            # 查询重写（可选）
+            if use_rewrite:
+                queries = self.generation_module.query_rewrite_batch(
+                    questions, max_concurrency=self.config.batch_max_concurrency
+                )
+            else:
+                queries = list(questions)
+
+            # 批量检索相关文档
+            if self.retrieval_module:
+                docs_list = self.retrieval_module.hybrid_search_batch(queries, top_k=self.config.top_k)
+            else:
+                docs_list = [self.index_module.similarity_search(query, k=self.config.top_k) for query in queries]
+
+            # 并发生成回答
+            responses = self.generation_module.generate_basic_answer_batch(
+                questions, docs_list, max_concurrency=self.config.batch_max_concurrency
+            )
+        except Exception as e:
+            self.logger.error(f"批量查询失败: {e}")
+            responses = [e] * len(questions)
+
+        for i, question, response in zip(pending, questions, responses):
+            if isinstance(response, Exception):
+                self.logger.error(f"查询失败: {question[:50]}... ({response})")
+                answers[i] = f"抱歉，查询过程中出现错误: {str(response)}"
+            else:
+                answers[i] = response
+                self._cache_answer(question, response)
+
+        elapsed_time = time.time() - start_time
+        self.logger.info(f"批量查询完成: {len(all_questions)} 个问题(缓存命中 {len(all_questions) - len(pending)} 个), "
+                         f"耗时 {elapsed_time:.2f} 秒")
+        return answers
+
+    def _get_cached_answer(self, question: str) -> Optional[str]:
+        """
+        查找缓存的回答，索引版本变化时先清空缓存
+
+        Args:
+            question: 用户问题
+
+        Returns:
+            缓存的回答，未启用缓存或未命中时返回None
+        """
+        if not self.answer_cache or not self.retrieval_module:
+            return None
+        self.answer_cache.check_version(self.retrieval_module.index_version)
+        return self.answer_cache.get(question)
+
+    def _cache_answer(self, question: str, answer: str):
+        """缓存成功生成的回答"""
+        if self.answer_cache and answer:
+            self.answer_cache.put(question, answer)
+
+    def _retrieve_documents(self, question: str, use_rewrite: bool) -> List[Document]:
+        """
+        (可选)重写查询后检索相关文档，开启推测检索时重写与检索同时进行
+
+        Args:
+            question: 用户问题
+            use_rewrite: 是否使用查询重写
+
+        Returns:
+            相关文档列表
+        """
+        if use_rewrite and self.config.speculative_retrieval and self.retrieval_module:
+            return self._speculative_retrieve(question)
+
+        query_to_use = self.generation_module.query_rewrite(question) if use_rewrite else question
+        return self._search(query_to_use)
+
+    def _speculative_retrieve(self, question: str) -> List[Document]:
+        """
+        推测检索 - 查询重写在后台进行的同时先用原问题检索；
+        重写结果与原问题一致时直接复用，否则用重写后的查询再检索一次(可选与原问题的结果融合)
+
+        Args:
+            question: 用户问题
+
+        Returns:
+            相关文档列表
+        """
+        rewrite_future = self.rewrite_executor.submit(self.generation_module.query_rewrite, question)
+        speculative_docs = self._search(question)
+        rewritten_query = rewrite_future.result()
+
+        if rewritten_query.strip() == question.strip():
+            self._count_speculation('reused')
+            return speculative_docs
+
+        self._count_speculation('retrieved_again')
+        rewritten_docs = self._search(rewritten_query)
+        if not self.config.speculative_merge:
+            return rewritten_docs
+        return self.retrieval_module.merge_results([rewritten_docs, speculative_docs], top_k=self.config.top_k)
+
+    def _count_speculation(self, key: str):
+        """在锁内累加推测检索统计"""
+        with self._stats_lock:
+            self.speculation_stats[key] += 1
+
+    async def _aretrieve_documents(self, question: str, use_rewrite: bool) -> List[Document]:
+        """
+        (可选)重写查询后检索相关文档 - 异步版本，检索在线程池中执行
+
+        Args:
+            question: 用户问题
+            use_rewrite: 是否使用查询重写
+
+        Returns:
+            相关文档列表
+        """
+        loop = asyncio.get_running_loop()
+        if not use_rewrite:
+            return await loop.run_in_executor(None, self._search, question)
+
+        if not (self.config.speculative_retrieval and self.retrieval_module):
+            rewritten_query = await self.generation_module.aquery_rewrite(question)
+            return await loop.run_in_executor(None, self._search, rewritten_query)
+
+        # 推测检索: 重写请求与原问题的检索同时进行
+        rewrite_task = asyncio.ensure_future(self.generation_module.aquery_rewrite(question))
+        try:
+            speculative_docs = await loop.run_in_executor(None, self._search, question)
+        except BaseException:
+            rewrite_task.cancel()
+            raise
+        rewritten_query = await rewrite_task
+
+        if rewritten_query.strip() == question.strip():
+            self._count_speculation('reused')
+            return speculative_docs
+
+        self._count_speculation('retrieved_again')
+        rewritten_docs = await loop.run_in_executor(None, self._search, rewritten_query)
+        if not self.config.speculative_merge:
+            return rewritten_docs
+        return self.retrieval_module.merge_results([rewritten_docs, speculative_docs], top_k=self.config.top_k)
+
+    def _search(self, query: str) -> List[Document]:
+        """混合检索，检索模块未初始化时退回基础相似度检索"""
+        if self.retrieval_module:
+            return self.retrieval_module.hybrid_search(query, top_k=self.config.top_k)
+        return self.index_module.similarity_search(query, k=self.config.top_k)
+
     def get_system_stats(self) -> Dict[str, Any]:
         """获取系统统计信息"""
         if not self.data_module:
@@ -264,7 +713,7 @@ class ProgrammerHelperRAGSystem:
             
         stats = {
             "initialized": self.is_initialized,
-            "total_documents": len(self.documents),
+            "total_documents": len(self.data_module.manifest) or len(self.documents),
             "total_chunks": len(self.chunks),
             "config": self.config.to_dict()
         }
@@ -272,7 +721,24 @@ class ProgrammerHelperRAGSystem:
         # 添加数据统计信息
         if self.data_module:
             data_stats = self.data_module.get_statistics()
+            # 增量加载时数据模块只持有变化的文档，总数以系统视角为准
+            data_stats.pop("total_documents", None)
+            data_stats.pop("total_chunks", None)
             stats.update(data_stats)
+
+        # 添加检索缓存统计信息
+        if self.retrieval_module:
+            stats["cache"] = self.retrieval_module.get_cache_stats()
+            stats["dropped_retriever_legs"] = dict(self.retrieval_module.dropped_legs)
+        if self.answer_cache:
+            stats["answer_cache"] = self.answer_cache.get_stats()
+        if self.deduplicator:
+            stats["dedup"] = self.deduplicator.get_stats()
+        if self.generation_module:
+            stats["query_rewrite"] = self.generation_module.get_rewrite_stats()
+        if self.config.speculative_retrieval:
+            with self._stats_lock:
+                stats["speculative_retrieval"] = dict(self.speculation_stats)
             
         return stats
 
@@ -314,6 +780,40 @@ class ProgrammerHelperRAGSystem:
         
         return answer
 
+    async def asearch_by_category(self, query: str, category: str, top_k: int = None) -> str:
+        """
+        按分类检索 - 异步版本
+
+        Args:
+            query: 查询问题
+            category: 技术分类
+            top_k: 返回文档数量
+
+        Returns:
+            回答结果
+        """
+        if not self.is_initialized:
+            raise RuntimeError("系统尚未初始化")
+
+        if not self.retrieval_module:
+            raise RuntimeError("检索模块未初始化")
+
+        top_k = top_k or self.config.top_k
+
+        # 使用元数据过滤检索
+        relevant_docs = await asyncio.get_running_loop().run_in_executor(
+            None, self.retrieval_module.metadata_filtered_search, query, {"category": category}, top_k
+        )
+
+        if not relevant_docs:
+            return f"抱歉，在 '{category}' 分类中没有找到相关内容。"
+
+        # 生成回答
+        return await self.generation_module.agenerate_basic_answer(
+            query=query,
+            context_docs=relevant_docs
+        )
+
 
 def create_interactive_cli():
     """创建交互式命令行界面"""
@@ -366,6 +866,12 @@ def create_interactive_cli():
                     print(f"   文档块总数: {stats.get('total_chunks', 0)}")
                     if 'categories' in stats:
                         print(f"   分类统计: {stats['categories']}")
+                    if 'cache' in stats:
+                        print(f"   缓存统计: {stats['cache']}")
+                    if 'query_rewrite' in stats:
+                        rewrite_stats = stats['query_rewrite']
+                        print(f"   查询重写: 跳过率 {rewrite_stats['skip_rate']:.1%}, "
+                              f"预计节省 {rewrite_stats['estimated_saved_seconds']:.1f} 秒")
                     
                 elif user_input.lower().startswith('category '):
                     parts = user_input[9:].split(' ', 1)  # 去掉 'category '
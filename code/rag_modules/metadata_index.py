@@ -0,0 +1,195 @@
+"""
+元数据索引模块
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# 字段 -> 去重时归并的副本取值所在的元数据字段，规范chunk同时以副本的取值建立索引
+DUPLICATE_FIELDS = {
+    'category': 'duplicate_categories',
+    'parent_id': 'duplicate_parent_ids',
+    'title': 'duplicate_titles'
+}
+
+
+def _ids_digest(chunk_ids: List[str]) -> str:
+    """chunk ID列表的摘要，用于校验持久化索引与当前索引的位置是否一致"""
+    return hashlib.md5("\n".join(chunk_ids).encode("utf-8")).hexdigest()
+
+
+def metadata_values(metadata: Dict[str, Any], field: str) -> List[Any]:
+    """
+    获取chunk在某个字段上的全部取值 - 自身的取值加上去重时归并的副本的取值
+
+    Args:
+        metadata: chunk元数据
+        field: 字段名
+
+    Returns:
+        取值列表(字段不存在时为空)
+    """
+    values = [metadata[field]] if metadata.get(field) is not None else []
+    duplicate_field = DUPLICATE_FIELDS.get(field)
+    if duplicate_field:
+        values.extend(value for value in metadata.get(duplicate_field, ()) if value not in values)
+    return values
+
+
+class MetadataIndex:
+    """元数据索引 - 为每个字段的每个取值维护有序的chunk位置集合，用于检索前过滤"""
+
+    FORMAT_VERSION = 2
+    DEFAULT_FIELDS = ("category", "parent_id", "title")
+
+    def __init__(self, fields: Sequence[str] = DEFAULT_FIELDS):
+        """
+        初始化元数据索引
+
+        Args:
+            fields: 需要建立索引的元数据字段
+        """
+        self.fields = tuple(fields)
+        self.size = 0
+        self.corpus_version: Optional[str] = None
+        self.ids_digest: Optional[str] = None
+        self.postings: Dict[str, Dict[str, np.ndarray]] = {field: {} for field in self.fields}
+
+    @classmethod
+    def build(cls, chunks: Sequence[Document], chunk_ids: List[str], corpus_version: Optional[str] = None,
+              fields: Sequence[str] = DEFAULT_FIELDS) -> 'MetadataIndex':
+        """
+        从chunk元数据构建索引(包括去重时归并的副本的取值)
+
+        Args:
+            chunks: 按位置排列的chunk
+            chunk_ids: 与chunk一一对应的ID
+            corpus_version: 语料版本(摄取清单摘要)
+            fields: 需要建立索引的元数据字段
+
+        Returns:
+            元数据索引
+        """
+        index = cls(fields)
+        index.size = len(chunk_ids)
+        index.corpus_version = corpus_version
+        index.ids_digest = _ids_digest(chunk_ids)
+
+        positions: Dict[str, Dict[str, List[int]]] = {field: {} for field in index.fields}
+        for position, chunk in enumerate(chunks):
+            for field in index.fields:
+                for value in metadata_values(chunk.metadata, field):
+                    positions[field].setdefault(str(value), []).append(position)
+
+        index.postings = {
+            field: {value: np.asarray(ids, dtype=np.int64) for value, ids in values.items()}
+            for field, values in positions.items()
+        }
+        logger.info(f"元数据索引构建完成: " + ", ".join(
+            f"{field} {len(values)} 个取值" for field, values in index.postings.items()))
+        return index
+
+    def allowed_positions(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        计算满足过滤条件的chunk位置 - 同一字段多个取值取并集，不同字段取交集
+
+        Args:
+            filters: 元数据过滤条件，取值可以是单个值或列表
+
+        Returns:
+            升序排列的位置数组；过滤条件包含未建索引的字段时返回None
+        """
+        if any(field not in self.postings for field in filters):
+            return None
+
+        allowed: Optional[np.ndarray] = None
+        for field, value in filters.items():
+            values = value if isinstance(value, list) else [value]
+            parts = [self.postings[field].get(str(v)) for v in values]
+            parts = [part for part in parts if part is not None]
+            field_positions = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+            allowed = field_positions if allowed is None else np.intersect1d(allowed, field_positions)
+            if not len(allowed):
+                break
+        return allowed if allowed is not None else np.arange(self.size, dtype=np.int64)
+
+    def to_mask(self, positions: np.ndarray) -> np.ndarray:
+        """将位置数组转换为长度为chunk总数的布尔掩码"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def save(self, path: str):
+        """
+        保存索引到JSON文件
+
+        Args:
+            path: 文件路径
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'format_version': self.FORMAT_VERSION,
+            'corpus_version': self.corpus_version,
+            'ids_digest': self.ids_digest,
+            'size': self.size,
+            'postings': {
+                field: {value: ids.tolist() for value, ids in values.items()}
+                for field, values in self.postings.items()
+            }
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logger.info(f"元数据索引已保存到: {path}")
+
+    @classmethod
+    def load(cls, path: str, corpus_version: Optional[str], chunk_ids: List[str],
+             fields: Sequence[str] = DEFAULT_FIELDS) -> Optional['MetadataIndex']:
+        """
+        从JSON文件加载索引，语料版本、chunk列表或字段不一致时视为过期
+
+        Args:
+            path: 文件路径
+            corpus_version: 当前语料版本
+            chunk_ids: 当前按位置排列的chunk ID
+            fields: 需要建立索引的元数据字段
+
+        Returns:
+            元数据索引，不存在或已过期时返回None
+        """
+        if not Path(path).exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取元数据索引失败: {e}")
+            return None
+
+        if (data.get('format_version') != cls.FORMAT_VERSION
+                or data.get('corpus_version') != corpus_version
+                or data.get('ids_digest') != _ids_digest(chunk_ids)
+                or set(data.get('postings', {})) != set(fields)):
+            logger.info("元数据索引已过期，将重新构建")
+            return None
+
+        index = cls(fields)
+        index.size = data['size']
+        index.corpus_version = data['corpus_version']
+        index.ids_digest = data['ids_digest']
+        index.postings = {
+            field: {value: np.asarray(ids, dtype=np.int64) for value, ids in values.items()}
+            for field, values in data['postings'].items()
+        }
+        logger.info(f"元数据索引已从 {path} 加载")
+        return index
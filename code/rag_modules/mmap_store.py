@@ -0,0 +1,184 @@
+"""
+内存映射索引存储模块
+"""
+
+import os
+import json
+import mmap
+import logging
+from pathlib import Path
+from typing import Dict, List, Iterator, Sequence, Union, overload
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.faiss"
+CHUNKS_FILENAME = "chunks.bin"
+OFFSETS_FILENAME = "chunks.offsets.npy"
+IDS_FILENAME = "chunk_ids.json"
+
+
+def has_mmap_index(index_path: str) -> bool:
+    """目录下是否存在内存映射格式的索引"""
+    path = Path(index_path)
+    return all((path / name).exists() for name in (INDEX_FILENAME, CHUNKS_FILENAME, OFFSETS_FILENAME, IDS_FILENAME))
+
+
+def save_mmap_index(index_path: str, index: "faiss.Index", chunk_ids: List[str], documents: Sequence[Document]):
+    """
+    以内存映射格式保存索引
+
+    - index.faiss: FAISS原生格式的向量索引
+    - chunks.bin: 顺序拼接的chunk记录(UTF-8 JSON)，第i条对应向量位置i
+    - chunks.offsets.npy: 每条记录的起始偏移(uint64, 长度n+1)
+    - chunk_ids.json: 向量位置对应的chunk ID
+
+    Args:
+        index_path: 保存目录
+        index: FAISS索引
+        chunk_ids: 按向量位置排列的chunk ID
+        documents: 按向量位置排列的chunk
+    """
+    path = Path(index_path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    offsets = np.zeros(len(documents) + 1, dtype=np.uint64)
+    tmp_chunks = path / f"{CHUNKS_FILENAME}.tmp"
+    with open(tmp_chunks, 'wb') as f:
+        position = 0
+        for i, doc in enumerate(documents):
+            record = json.dumps(
+                {'page_content': doc.page_content, 'metadata': doc.metadata},
+                ensure_ascii=False
+            ).encode('utf-8')
+            f.write(record)
+            position += len(record)
+            offsets[i + 1] = position
+
+    tmp_offsets = path / f"{OFFSETS_FILENAME}.tmp"
+    with open(tmp_offsets, 'wb') as f:
+        np.save(f, offsets)
+
+    tmp_ids = path / f"{IDS_FILENAME}.tmp"
+    with open(tmp_ids, 'w', encoding='utf-8') as f:
+        json.dump(chunk_ids, f)
+
+    tmp_index = path / f"{INDEX_FILENAME}.tmp"
+    faiss.write_index(index, str(tmp_index))
+
+    # 数据文件先替换，ID列表最后替换
+    os.replace(tmp_chunks, path / CHUNKS_FILENAME)
+    os.replace(tmp_offsets, path / OFFSETS_FILENAME)
+    os.replace(tmp_index, path / INDEX_FILENAME)
+    os.replace(tmp_ids, path / IDS_FILENAME)
+
+
+def read_faiss_index(index_path: str, use_mmap: bool = True) -> "faiss.Index":
+    """
+    读取FAISS索引，优先以只读内存映射方式加载
+
+    IVF索引的倒排表在 IO_FLAG_MMAP 下直接映射；Flat/HNSW的向量编码需要
+    faiss>=1.10 提供的 IO_FLAG_MMAP_IFC 才能零拷贝，旧版本退回普通读取。
+
+    Args:
+        index_path: 索引目录
+        use_mmap: 是否使用内存映射
+
+    Returns:
+        FAISS索引
+    """
+    file_path = str(Path(index_path) / INDEX_FILENAME)
+    if use_mmap:
+        flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(file_path, flags)
+        except RuntimeError as e:
+            logger.info(f"当前索引类型不支持内存映射加载({e})，改为普通读取")
+    return faiss.read_index(file_path)
+
+
+class MmapDocstore(Docstore):
+    """只读的内存映射docstore - chunk记录按偏移量按需解析，多进程共享同一份页缓存"""
+
+    def __init__(self, index_path: str):
+        """
+        打开内存映射docstore
+
+        Args:
+            index_path: 索引目录
+        """
+        path = Path(index_path)
+        with open(path / IDS_FILENAME, 'r', encoding='utf-8') as f:
+            self.chunk_ids: List[str] = json.load(f)
+        # 偏移数组只有 8 字节/chunk，直接读入内存，不占用文件句柄
+        self._offsets = np.load(path / OFFSETS_FILENAME)
+        self._file = open(path / CHUNKS_FILENAME, 'rb')
+        # 空文件无法映射
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self.chunk_ids) else b''
+        self._positions: Dict[str, int] = {chunk_id: i for i, chunk_id in enumerate(self.chunk_ids)}
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def get_by_position(self, position: int) -> Document:
+        """
+        按向量位置读取chunk
+
+        Args:
+            position: 向量位置
+
+        Returns:
+            chunk文档
+        """
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        record = json.loads(self._data[start:end])
+        return Document(page_content=record['page_content'], metadata=record['metadata'])
+
+    def search(self, search: str) -> Union[str, Document]:
+        """按chunk ID读取chunk，与InMemoryDocstore一致，找不到时返回提示字符串"""
+        position = self._positions.get(search)
+        if position is None:
+            return f"ID {search} not found."
+        return self.get_by_position(position)
+
+    def delete(self, ids: List) -> None:
+        raise NotImplementedError("内存映射docstore为只读，请先转换为内存docstore")
+
+    def close(self):
+        """关闭映射文件"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class LazyDocumentList(Sequence):
+    """按需从内存映射docstore解析chunk的只读序列，可替代List[Document]使用"""
+
+    def __init__(self, docstore: MmapDocstore):
+        self.docstore = docstore
+
+    def __len__(self) -> int:
+        return len(self.docstore)
+
+    @overload
+    def __getitem__(self, index: int) -> Document: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Document]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.docstore.get_by_position(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.docstore.get_by_position(index)
+
+    def __iter__(self) -> Iterator[Document]:
+        for i in range(len(self)):
+            yield self.docstore.get_by_position(i)
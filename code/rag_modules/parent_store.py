@@ -0,0 +1,133 @@
+"""
+父文档存储模块
+"""
+
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional, Iterable
+
+from langchain_core.documents import Document
+
+from lru_cache import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class ParentDocumentStore:
+    """父文档存储 - 按parent_id常驻元数据，正文按需从源文件读取并放入LRU缓存"""
+
+    def __init__(self, cache_size: int = 128):
+        """
+        初始化父文档存储
+
+        Args:
+            cache_size: 常驻内存的父文档正文数量上限
+        """
+        # parent_id -> 父文档元数据(包含source和内容哈希hash)
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._cache = TTLLRUCache(max_size=cache_size)
+        self.loads = 0
+
+    def __len__(self) -> int:
+        return len(self._metadata)
+
+    def __contains__(self, parent_id: str) -> bool:
+        return parent_id in self._metadata
+
+    def add(self, parent_id: str, metadata: Dict[str, Any], document: Optional[Document] = None):
+        """
+        登记父文档
+
+        Args:
+            parent_id: 父文档ID
+            metadata: 父文档元数据，需包含source；包含hash时读取正文会校验内容是否变化
+            document: 已加载的父文档，提供时直接放入缓存
+        """
+        self._metadata[parent_id] = dict(metadata)
+        self._cache.pop(parent_id)
+        if document is not None:
+            self._cache.put(parent_id, document)
+
+    def clear(self):
+        """清空存储"""
+        self._metadata.clear()
+        self._cache.clear()
+
+    def get_metadata(self, parent_id: str) -> Optional[Dict[str, Any]]:
+        """获取父文档元数据，不读取正文"""
+        return self._metadata.get(parent_id)
+
+    def iter_metadata(self) -> Iterable[Dict[str, Any]]:
+        """遍历全部父文档的元数据"""
+        return self._metadata.values()
+
+    def get(self, parent_id: str) -> Optional[Document]:
+        """
+        按ID获取父文档，未缓存时从源文件读取
+
+        Args:
+            parent_id: 父文档ID
+
+        Returns:
+            父文档，不存在或读取失败时返回None
+        """
+        metadata = self._metadata.get(parent_id)
+        if metadata is None:
+            return None
+        doc = self._cache.get(parent_id)
+        if doc is None:
+            doc = self._load(metadata)
+            if doc is not None:
+                self._cache.put(parent_id, doc)
+        return doc
+
+    def get_many(self, parent_ids: Iterable[str]) -> List[Document]:
+        """按ID批量获取父文档，跳过不存在或读取失败的ID"""
+        documents = (self.get(parent_id) for parent_id in parent_ids)
+        return [doc for doc in documents if doc is not None]
+
+    def parent_ids_by_category(self, category: str) -> List[str]:
+        """获取指定分类下的全部父文档ID"""
+        return [parent_id for parent_id, metadata in self._metadata.items() if metadata.get('category') == category]
+
+    def category_counts(self) -> Dict[str, int]:
+        """统计各分类的父文档数量"""
+        counts: Dict[str, int] = {}
+        for metadata in self._metadata.values():
+            category = metadata.get('category', '未知')
+            counts[category] = counts.get(category, 0) + 1
+        return counts
+
+    def _load(self, metadata: Dict[str, Any]) -> Optional[Document]:
+        """从源文件读取父文档正文"""
+        try:
+            with open(metadata['source'], 'r', encoding='utf-8') as f:
+                content = f.read()
+        except Exception as e:
+            logger.warning(f"读取父文档 {metadata['source']} 失败: {e}")
+            return None
+
+        expected_hash = metadata.get('hash')
+        if expected_hash and hashlib.md5(content.encode("utf-8")).hexdigest() != expected_hash:
+            logger.warning(f"父文档 {metadata['source']} 在摄取后已被修改，返回的是当前内容")
+
+        self.loads += 1
+        doc_metadata = {key: value for key, value in metadata.items() if key != 'hash'}
+        return Document(page_content=content, metadata=doc_metadata)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取存储统计信息
+
+        Returns:
+            统计信息字典
+        """
+        stats = self._cache.get_stats()
+        return {
+            'parents': len(self._metadata),
+            'cached': stats['size'],
+            'cache_size': stats['max_size'],
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'loads': self.loads
+        }
@@ -0,0 +1,189 @@
+"""
+重排序模块
+"""
+
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+
+from lru_cache import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """交叉编码器重排序 - 对融合后的候选逐对打分，候选池大小按单次查询的延迟预算自适应"""
+
+    def __init__(self, model_name: str = "BAAI/bge-reranker-base", batch_size: int = 16, max_length: int = 512,
+                 latency_budget_ms: float = 300, min_candidates: int = 10, max_candidates: int = 50,
+                 min_score: Optional[float] = None, cache_size: int = 8192, cache_ttl: Optional[float] = 3600):
+        """
+        初始化重排序器
+
+        Args:
+            model_name: 交叉编码器模型名称
+            batch_size: 每批打分的 (查询, 文档) 对数量
+            max_length: 查询与文档拼接后的最大token数
+            latency_budget_ms: 单次查询重排序的延迟预算(毫秒)，决定每次最多为多少个未缓存的候选打分
+            min_candidates: 候选池的最小大小(不受延迟预算限制)
+            max_candidates: 候选池的最大大小
+            min_score: 重排序分数低于该值的候选不返回(至少保留一个)，为None时不过滤
+            cache_size: (查询, chunk ID) 分数缓存的最大条目数
+            cache_ttl: 分数缓存的存活秒数，为None或<=0时不过期
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.latency_budget_ms = latency_budget_ms
+        self.min_candidates = min_candidates
+        self.max_candidates = max(min_candidates, max_candidates)
+        self.min_score = min_score
+        # chunk ID包含内容哈希，内容变化后键自然不同，索引重建时无需清空
+        self.score_cache = TTLLRUCache(max_size=cache_size, ttl=cache_ttl)
+        self.model = None
+        # 每对打分耗时的指数滑动平均(毫秒)，由实际打分持续校准
+        self.ms_per_pair: Optional[float] = None
+        self.stats = {'queries': 0, 'scored_pairs': 0, 'cached_pairs': 0, 'pool_total': 0}
+        # 多个检索线程共享同一个模型，串行推理避免CPU线程超额订阅
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """模型是否已加载"""
+        return self.model is not None
+
+    def load(self) -> bool:
+        """
+        加载交叉编码器模型并预热，同时测得初始的单对打分耗时
+
+        Returns:
+            是否加载成功；未安装sentence_transformers或加载失败时返回False，检索退回融合排序
+        """
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            logger.warning("未安装sentence_transformers，跳过交叉编码器重排序")
+            return False
+
+        try:
+            logger.info(f"正在加载重排序模型: {self.model_name}")
+            self.model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        except Exception as e:
+            logger.warning(f"加载重排序模型失败，跳过重排序: {e}")
+            self.model = None
+            return False
+
+        # 首次推理包含一次性的初始化开销，预热后再计时
+        warmup_pairs = [("预热", "预热")] * self.batch_size
+        self._predict(warmup_pairs)
+        self.ms_per_pair = None
+        self._predict(warmup_pairs)
+        logger.info(f"重排序模型加载完成，单对打分约 {self.ms_per_pair:.2f} ms")
+        return True
+
+    def pool_size(self, top_k: int) -> int:
+        """
+        按延迟预算计算本次最多为多少个未缓存的候选打分
+
+        Args:
+            top_k: 最终需要的结果数量
+
+        Returns:
+            未缓存候选的打分上限
+        """
+        floor = max(top_k, self.min_candidates)
+        if not self.ms_per_pair:
+            return floor
+        affordable = int(self.latency_budget_ms / self.ms_per_pair)
+        return max(floor, min(self.max_candidates, affordable))
+
+    def rerank(self, query: str, candidates: Sequence[str], top_k: int,
+               get_text: Callable[[str], str]) -> List[Tuple[str, float]]:
+        """
+        重排序候选
+
+        按原有(融合)顺序取候选，已缓存分数的候选不占预算，未缓存的候选达到预算上限或总数达到max_candidates时停止；
+        候选池之外的结果不参与重排序，也不会被返回。只读取需要打分的候选的文本。
+
+        Args:
+            query: 查询文本
+            candidates: 按融合分数降序的chunk ID列表
+            top_k: 返回结果数量
+            get_text: 按chunk ID读取文本的函数
+
+        Returns:
+            按重排序分数降序的 (chunk ID, 分数) 列表
+        """
+        if not candidates:
+            return []
+
+        budget = self.pool_size(top_k)
+        pool, scores, pending = [], {}, []
+        for chunk_id in candidates[:self.max_candidates]:
+            cached = self.score_cache.get((query, chunk_id))
+            if cached is not None:
+                scores[chunk_id] = cached
+            elif len(pending) < budget:
+                pending.append((chunk_id, get_text(chunk_id)))
+            else:
+                break
+            pool.append(chunk_id)
+
+        if pending:
+            predicted = self._predict([(query, text) for _, text in pending])
+            for (chunk_id, _), score in zip(pending, predicted):
+                scores[chunk_id] = score
+                self.score_cache.put((query, chunk_id), score)
+
+        self.stats['queries'] += 1
+        self.stats['scored_pairs'] += len(pending)
+        self.stats['cached_pairs'] += len(pool) - len(pending)
+        self.stats['pool_total'] += len(pool)
+
+        # 分数相同时保持融合顺序
+        ranked = sorted(pool, key=lambda chunk_id: -scores[chunk_id])
+        results = [(chunk_id, scores[chunk_id]) for chunk_id in ranked[:top_k]]
+        if self.min_score is not None:
+            results = [item for item in results if item[1] >= self.min_score] or results[:1]
+        logger.info(f"重排序完成: 候选池 {len(pool)} 个(新打分 {len(pending)} 个), 返回 {len(results)} 个")
+        return results
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """
+        批量打分并更新单对耗时的估计
+
+        Args:
+            pairs: (查询, 文档) 对列表
+
+        Returns:
+            与pairs顺序一致的分数
+        """
+        with self._lock:
+            start = time.perf_counter()
+            scores = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+        observed = elapsed_ms / len(pairs)
+        self.ms_per_pair = observed if self.ms_per_pair is None else 0.8 * self.ms_per_pair + 0.2 * observed
+        return [float(score) for score in scores]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取重排序统计信息
+
+        Returns:
+            统计信息字典
+        """
+        queries = self.stats['queries']
+        return {
+            'model': self.model_name,
+            'available': self.available,
+            'queries': queries,
+            'scored_pairs': self.stats['scored_pairs'],
+            'cached_pairs': self.stats['cached_pairs'],
+            'avg_pool_size': self.stats['pool_total'] / queries if queries else 0.0,
+            'ms_per_pair': self.ms_per_pair,
+            'pool_size': self.pool_size(self.min_candidates),
+            'score_cache': self.score_cache.get_stats()
+        }
@@ -2,51 +2,165 @@
 检索优化模块
 """
 
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
 
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from bm25_index import BM25Index
+from diversity import SimHashIndex, diversify
+from fusion import FUSION_STRATEGIES, fuse
+from lru_cache import TTLLRUCache
+from metadata_index import MetadataIndex, metadata_values
+from reranker import CrossEncoderReranker
 
 logger = logging.getLogger(__name__)
 
 class RetrievalOptimizationModule:
     """检索优化模块 - 负责混合检索和过滤"""
+    BM25_FILENAME = "bm25_index.npz"
+    METADATA_INDEX_FILENAME = "metadata_index.json"
+    SIMHASH_FILENAME = "simhash_signatures.npz"
 
-    def __init__(self, vectorstore: FAISS, chunks: List[Document]):
+    def __init__(self, vectorstore: FAISS, chunks: Sequence[Document],
+                 query_cache_size: int = 1024, query_cache_ttl: float = 3600,
+                 bm25_path: Optional[str] = None, corpus_version: Optional[str] = None,
+                 bm25_tokenizer: str = "cjk_bigram", vector_candidate_factor: int = 4,
+                 bm25_candidate_factor: int = 4, min_candidate_k: int = 20, max_candidate_k: int = 200,
+                 filter_candidate_factor: int = 5, metadata_index_path: Optional[str] = None,
+                 prefilter_bruteforce_limit: int = 2048, parallel_hybrid: bool = True,
+                 retriever_timeout: float = 5.0, retrieval_workers: int = 16, fusion_strategy: str = "rrf",
+                 vector_weight: float = 1.0, bm25_weight: float = 1.0, rrf_k: int = 60,
+                 reranker: Optional[CrossEncoderReranker] = None, enable_diversity: bool = True,
+                 simhash_path: Optional[str] = None, diversity_candidate_factor: int = 3,
+                 mmr_lambda: float = 0.7, simhash_max_distance: int = 3):
         """
         初始化检索优化模块
         
         Args:
             vectorstore: FAISS向量存储
-            chunks: 文档块列表
+            chunks: 文档块列表(顺序与向量索引中的位置一致)
+            query_cache_size: 查询向量LRU缓存的最大条目数
+            query_cache_ttl: 查询向量缓存的存活秒数
+            bm25_path: BM25索引持久化路径，为None时每次启动重新构建
+            corpus_version: 语料版本(摄取清单摘要)，用于判断持久化的BM25索引是否过期
+            bm25_tokenizer: BM25分词器(cjk_bigram / jieba / whitespace)
+            vector_candidate_factor: 向量检索候选深度相对top_k的倍数
+            bm25_candidate_factor: BM25检索候选深度相对top_k的倍数
+            min_candidate_k: 每路检索的最小候选深度
+            max_candidate_k: 每路检索的最大候选深度
+            filter_candidate_factor: 带元数据过滤时候选深度的额外倍数(仅用于无法预过滤的后过滤检索)
+            metadata_index_path: 元数据索引持久化路径，为None时每次启动重新构建
+            prefilter_bruteforce_limit: 预过滤后候选不超过该数量时直接对其向量精确计算距离
+            parallel_hybrid: 是否并发执行向量检索和BM25检索
+            retriever_timeout: 并发检索时单路检索的超时秒数(从该路开始执行时计时)，<=0表示不超时
+            retrieval_workers: 并发检索线程池大小，需覆盖同时进行的查询数 × 2路检索
+            fusion_strategy: 多路结果融合策略(rrf / weighted_sum / combmnz)
+            vector_weight: 向量检索结果的融合权重
+            bm25_weight: BM25检索结果的融合权重
+            rrf_k: RRF平滑参数
+            reranker: 交叉编码器重排序器，为None或模型未加载时直接取融合排序的前top_k
+            enable_diversity: 是否对最终结果做多样化选择(SimHash近似重复过滤 + MMR)
+            simhash_path: SimHash签名持久化路径，为None时每次启动重新计算
+            diversity_candidate_factor: 多样化选择的候选数相对top_k的倍数
+            mmr_lambda: MMR中相关度的权重，1为只看相关度
+            simhash_max_distance: 视为近似重复的最大汉明距离
         """
+        if fusion_strategy not in FUSION_STRATEGIES:
+            raise ValueError(f"不支持的融合策略: {fusion_strategy}，可选: {', '.join(FUSION_STRATEGIES)}")
+
         self.vectorstore = vectorstore
         self.chunks = chunks
+        self.bm25_path = bm25_path
+        self.corpus_version = corpus_version
+        self.bm25_tokenizer = bm25_tokenizer
+        self.vector_candidate_factor = vector_candidate_factor
+        self.bm25_candidate_factor = bm25_candidate_factor
+        self.min_candidate_k = min_candidate_k
+        self.max_candidate_k = max_candidate_k
+        self.filter_candidate_factor = filter_candidate_factor
+        self.metadata_index_path = metadata_index_path
+        self.prefilter_bruteforce_limit = prefilter_bruteforce_limit
+        self.parallel_hybrid = parallel_hybrid
+        self.retriever_timeout = retriever_timeout if retriever_timeout and retriever_timeout > 0 else None
+        # 嵌入模型前向计算和FAISS搜索都会释放GIL，两路检索可以在线程中真正并行
+        self.executor = ThreadPoolExecutor(max_workers=max(2, retrieval_workers), thread_name_prefix="hybrid-retrieval") \
+            if parallel_hybrid else None
+        self.dropped_legs = {'vector': 0, 'bm25': 0}
+        self.fusion_strategy = fusion_strategy
+        self.fusion_weights = {'vector': vector_weight, 'bm25': bm25_weight}
+        self.rrf_k = rrf_k
+        self.reranker = reranker if reranker is not None and reranker.available else None
+        self.enable_diversity = enable_diversity
+        self.simhash_path = simhash_path
+        self.diversity_candidate_factor = max(1, diversity_candidate_factor)
+        self.mmr_lambda = mmr_lambda
+        self.simhash_max_distance = simhash_max_distance
+        index_to_id = vectorstore.index_to_docstore_id
+        self.chunk_ids = [index_to_id[i] for i in sorted(index_to_id)]
+        if len(self.chunk_ids) != len(chunks):
+            raise ValueError(f"文档块数量({len(chunks)})与向量索引({len(self.chunk_ids)})不一致")
+        self.chunk_positions = {chunk_id: i for i, chunk_id in enumerate(self.chunk_ids)}
+        # 索引版本 - chunk集合或顺序变化时改变，供回答缓存等下游缓存判断是否失效
+        self.index_version = hashlib.md5("\n".join(self.chunk_ids).encode("utf-8")).hexdigest()
+        # 查询向量缓存 - 重复的问题无需再次经过嵌入模型
+        self.query_embedding_cache = TTLLRUCache(max_size=query_cache_size, ttl=query_cache_ttl)
         self.setup_retrievers()
 
     def setup_retrievers(self):
         """设置向量检索器和BM25检索器"""
         logger.info("正在设置检索器...")
 
-        # 向量检索器 - 基于向量相似度、语义相似度,擅长理解查询意图
-        self.vector_retriever = self.vectorstore.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k":5}
-        )
-
+        # 向量检索 - 基于向量相似度、语义相似度,擅长理解查询意图(见 _vector_search)
         # BM25检索器 - 基于关键字匹配，擅长精确匹配
-        self.bm25_retriever = BM25Retriever.from_documents(
-            self.chunks,
-            k=5
-        )
+        self.bm25_index = None
+        if self.bm25_path:
+            self.bm25_index = BM25Index.load(
+                self.bm25_path, self.corpus_version, self.chunk_ids, tokenizer=self.bm25_tokenizer
+            )
+        if self.bm25_index is None:
+            self.bm25_index = BM25Index.build(
+                [chunk.page_content for chunk in self.chunks],
+                self.chunk_ids,
+                corpus_version=self.corpus_version,
+                tokenizer=self.bm25_tokenizer
+            )
+            if self.bm25_path:
+                self.bm25_index.save(self.bm25_path)
+
+        # 元数据索引 - 按分类/父文档/标题预先圈定候选集合，过滤检索时两路都只在集合内搜索
+        self.metadata_index = None
+        if self.metadata_index_path:
+            self.metadata_index = MetadataIndex.load(self.metadata_index_path, self.corpus_version, self.chunk_ids)
+        if self.metadata_index is None:
+            self.metadata_index = MetadataIndex.build(self.chunks, self.chunk_ids, corpus_version=self.corpus_version)
+            if self.metadata_index_path:
+                self.metadata_index.save(self.metadata_index_path)
+
+        # SimHash签名 - 多样化选择时判断候选是否近似重复
+        self.simhash_index = None
+        if self.enable_diversity:
+            if self.simhash_path:
+                self.simhash_index = SimHashIndex.load(self.simhash_path, self.corpus_version, self.chunk_ids)
+            if self.simhash_index is None:
+                self.simhash_index = SimHashIndex.build(
+                    [chunk.page_content for chunk in self.chunks], self.chunk_ids, corpus_version=self.corpus_version
+                )
+                if self.simhash_path:
+                    self.simhash_index.save(self.simhash_path)
 
         logger.info("检索器设置完成")
 
     def hybrid_search(self,query: str, top_k: int = 3) -> List[Document]:
         """
-        混合检索 - 结合向量检索和BM25检索，使用RRF重排
+        混合检索 - 结合向量检索和BM25检索，按配置的策略融合排序
 
         Args:
             query: 查询文本
@@ -55,104 +169,458 @@ class RetrievalOptimizationModule:
         Returns:
             检索到的文档列表
         """
-        # 分别获取向量检索和BM25检索结果
-        vector_docs = self.vector_retriever.get_relevant_documents(query)
-        bm25_docs = self.bm25_retriever.get_relevant_documents(query)
+        return [doc for doc, _ in self.hybrid_search_with_scores(query, top_k)]
 
-        # 使用RRF重排
-        reranked_docs = self._rrf_rerank(vector_docs,bm25_docs)
-        return reranked_docs[:top_k]
+    def hybrid_search_with_scores(self, query: str, top_k: int = 3) -> List[Tuple[Document, float]]:
+        """
+        混合检索并返回分数(融合分数，启用重排序时为交叉编码器分数；分数不写入文档元数据，chunk对象在并发查询间共享)
 
-    def metadata_filtered_search(self, query: str, filters: Dict[str, Any], top_k: int = 5) -> List[Document]:
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+
+        Returns:
+            (文档, 分数) 列表；未启用多样化时按分数降序，启用时按MMR的选择顺序(分数不一定单调)
         """
-        带元数据过滤的检索
-        
+        return self._to_documents(self._select(query, self._fused_search(query, top_k), top_k))
+
+    def _select(self, query: str, fused: List[Tuple[str, float]], top_k: int) -> List[Tuple[str, float]]:
+        """
+        从融合结果中选出最终结果 - 配置了重排序器时用交叉编码器重新打分，启用多样化时再从前
+        top_k * diversity_candidate_factor 个结果中去掉近似重复并按MMR选择
+
         Args:
             query: 查询文本
-            filters: 元数据过滤条件
+            fused: 按融合分数降序的 (chunk ID, 分数) 列表
             top_k: 返回结果数量
-            
+
         Returns:
-            过滤后的文档列表
+            (chunk ID, 分数) 列表，重排序后分数为交叉编码器分数
         """
-        # 先进行混合检索，获取更多候选
-        docs = self.hybrid_search(query, top_k * 3)
+        depth = top_k * self.diversity_candidate_factor if self.enable_diversity else top_k
+        if self.reranker is None:
+            ranked = fused[:depth]
+        else:
+            # 重排序器最多只看max_candidates个候选，且只读取需要打分的候选文本(内存映射docstore每次读取都要解析)
+            candidates = [chunk_id for chunk_id, _ in fused[:self.reranker.max_candidates]]
+            ranked = self.reranker.rerank(
+                query, candidates, depth,
+                get_text=lambda chunk_id: self.chunks[self.chunk_positions[chunk_id]].page_content
+            )
 
-        # 应用元数据过滤
-        filtered_docs = []
-        for doc in docs:
-            match = True
-            for key, value in filters.items():
-                if key in doc.metadata:
-                    if isinstance(value, list):
-                        if doc.metadata[key] not in value:
-                            match = False
-                            break
-                    else:
-                        if doc.metadata[key] != value:
-                            match = False
-                            break
-                else:
-                    match = False
-                    break
-            
-            if match:
-                filtered_docs.append(doc)
-                if len(filtered_docs) >= top_k:
-                    break
-        
-        return filtered_docs
+        if not self.enable_diversity or len(ranked) <= 1:
+            return ranked[:top_k]
+        positions = np.asarray([self.chunk_positions[chunk_id] for chunk_id, _ in ranked], dtype=np.int64)
+        return diversify(
+            ranked, positions, top_k,
+            signatures=self.simhash_index,
+            vectors=self._reconstruct(positions),
+            lambda_mult=self.mmr_lambda,
+            max_distance=self.simhash_max_distance
+        )
+
+    def _reconstruct(self, positions: np.ndarray) -> Optional[np.ndarray]:
+        """从FAISS索引取回已存储的chunk向量，索引不支持取回时返回None"""
+        try:
+            return self.vectorstore.index.reconstruct_batch(positions)
+        except RuntimeError:
+            # IVF类索引未建立直接映射时无法取回原始向量，此时只做近似重复过滤
+            return None
+
+    def _candidate_depth(self, top_k: int, factor: int, filtered: bool = False) -> int:
+        """
+        计算单路检索的候选深度 - 随top_k和过滤条件放大，并限制在[min, max]和语料规模之内
+
+        Args:
+            top_k: 最终需要的结果数量
+            factor: 该路检索的倍数
+            filtered: 是否带元数据过滤
 
-    def _rrf_rerank(self, vector_docs: List[Document], bm25_docs: List[Document], k: int = 60) -> List[Document]:
+        Returns:
+            候选深度
+        """
+        depth = top_k * factor
+        if filtered:
+            depth *= self.filter_candidate_factor
+        depth = max(self.min_candidate_k, min(self.max_candidate_k, depth))
+        return min(depth, len(self.chunk_ids))
+
+    def _fused_search(self, query: str, top_k: int, filtered: bool = False,
+                      allowed: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """
+        分别获取向量检索和BM25检索的候选并按chunk ID融合
+
+        Args:
+            query: 查询文本
+            top_k: 最终需要的结果数量(决定候选深度)
+            filtered: 结果是否还要经过元数据过滤
+            allowed: 预过滤得到的chunk位置，为None时在全部chunk中检索
+
+        Returns:
+            按融合分数降序的 (chunk ID, 分数) 列表
+        """
+        vector_k = self._candidate_depth(top_k, self.vector_candidate_factor, filtered)
+        bm25_k = self._candidate_depth(top_k, self.bm25_candidate_factor, filtered)
+        if allowed is not None:
+            vector_k, bm25_k = min(vector_k, len(allowed)), min(bm25_k, len(allowed))
+
+        # 分别获取向量检索和BM25检索结果
+        vector_results, bm25_results = self._run_legs({
+            'vector': lambda: self._vector_search(query, vector_k, allowed),
+            'bm25': lambda: self._bm25_search(query, bm25_k, allowed)
+        })
+
+        fused = self._fuse(vector_results, bm25_results)
+        logger.info(f"{self.fusion_strategy}融合完成: 向量检索{len(vector_results)}个文档, "
+                    f"BM25检索{len(bm25_results)}个文档, 合并后{len(fused)}个文档")
+        return fused
+
+    def hybrid_search_batch(self, queries: List[str], top_k: int = 3) -> List[List[Document]]:
         """
-        使用RRF (Reciprocal Rank Fusion) 算法重排文档
+        批量混合检索 - 所有查询一次批量嵌入、一次矩阵FAISS搜索，再逐条BM25检索并融合
 
         Args:
-            vector_docs: 向量检索结果
-            bm25_docs: BM25检索结果
-            k: RRF参数，用于平滑排名
+            queries: 查询文本列表
+            top_k: 每个查询返回的结果数量
 
         Returns:
-            重排后的文档列表
+            与queries顺序一致的文档列表
         """
-        doc_scores = {}
-        doc_objects = {}
+        if not queries:
+            return []
+
+        vector_k = self._candidate_depth(top_k, self.vector_candidate_factor)
+        bm25_k = self._candidate_depth(top_k, self.bm25_candidate_factor)
 
-        # 计算向量检索结果的RRF分数
-        for rank, doc in enumerate(vector_docs):
-            # 使用文档内容的哈希作为唯一标识
-            doc_id = hash(doc.page_content)
-            doc_objects[doc_id] = doc
+        # 批量检索追求吞吐量，两路并发但不设超时
+        if self.executor is not None:
+            vector_future = self.executor.submit(self._vector_search_batch, queries, vector_k)
+            bm25_batch = [self._bm25_search(query, bm25_k) for query in queries]
+            vector_batch = vector_future.result()
+        else:
+            vector_batch = self._vector_search_batch(queries, vector_k)
+            bm25_batch = [self._bm25_search(query, bm25_k) for query in queries]
 
-            # RRF公式: 1 / (k + rank)
-            rrf_score = 1.0 / (k + rank + 1)
-            doc_scores[doc_id] = doc_scores.get(doc_id, 0) + rrf_score
+        results = [
+            [doc for doc, _ in self._to_documents(self._select(query, self._fuse(vector_results, bm25_results), top_k))]
+            for query, vector_results, bm25_results in zip(queries, vector_batch, bm25_batch)
+        ]
+        logger.info(f"批量混合检索完成: {len(queries)} 个查询")
+        return results
+
+    def merge_results(self, doc_lists: List[List[Document]], top_k: int = 3) -> List[Document]:
+        """
+        用RRF按chunk ID融合多次检索的结果(如查询重写前后各检索一次)
+
+        Args:
+            doc_lists: 各次检索的文档列表，越靠前的列表在同分时越优先
+            top_k: 返回结果数量
 
-            logger.debug(f"向量检索 - 文档{rank+1}: RRF分数 = {rrf_score:.4f}")
+        Returns:
+            融合后的文档列表
+        """
+        docs_by_id = {}
+        ranked_lists = []
+        for docs in doc_lists:
+            for doc in docs:
+                docs_by_id.setdefault(doc.metadata['chunk_id'], doc)
+            ranked_lists.append([(doc.metadata['chunk_id'], 0.0) for doc in docs])
+        fused = fuse(ranked_lists, strategy="rrf", rrf_k=self.rrf_k)
+        return [docs_by_id[chunk_id] for chunk_id, _ in fused[:top_k]]
+
+    def _fuse(self, vector_results: List[Tuple[int, float]],
+              bm25_results: List[Tuple[int, float]]) -> List[Tuple[str, float]]:
+        """
+        按配置的策略融合两路检索结果
+
+        Args:
+            vector_results: 向量检索的 (chunk位置, 分数) 列表
+            bm25_results: BM25检索的 (chunk位置, 分数) 列表
+
+        Returns:
+            按融合分数降序的 (chunk ID, 分数) 列表
+        """
+        ranked_lists = [
+            [(self.chunk_ids[position], score) for position, score in results]
+            for results in (vector_results, bm25_results)
+        ]
+        return fuse(
+            ranked_lists,
+            weights=[self.fusion_weights['vector'], self.fusion_weights['bm25']],
+            strategy=self.fusion_strategy,
+            rrf_k=self.rrf_k
+        )
+
+    def _to_documents(self, fused: List[Tuple[str, float]]) -> List[Tuple[Document, float]]:
+        """将 (chunk ID, 分数) 列表转换为 (文档, 分数) 列表"""
+        return [(self.chunks[self.chunk_positions[chunk_id]], score) for chunk_id, score in fused]
+
+    def _run_legs(self, legs: Dict[str, Callable[[], List[Tuple[int, float]]]]) -> List[List[Tuple[int, float]]]:
+        """
+        执行各路检索 - 并发模式下同时提交到线程池，超时未完成的一路记为空结果
+
+        超时从该路开始执行时计算，在线程池中排队的时间不计入；排队中的检索不会被取消。
+
+        Args:
+            legs: 检索名称到检索函数的映射
+
+        Returns:
+            与legs顺序一致的检索结果列表
+        """
+        if self.executor is None:
+            return [leg() for leg in legs.values()]
 
-        # 计算BM25检索结果的RRF分数
-        for rank, doc in enumerate(bm25_docs):
-            doc_id = hash(doc.page_content)
-            doc_objects[doc_id] = doc
+        started: Dict[str, float] = {}
 
-            rrf_score = 1.0 / (k + rank + 1)
-            doc_scores[doc_id] = doc_scores.get(doc_id, 0) + rrf_score
+        def timed(name: str, leg: Callable[[], List[Tuple[int, float]]]) -> List[Tuple[int, float]]:
+            started[name] = time.monotonic()
+            return leg()
 
-            logger.debug(f"BM25检索 - 文档{rank+1}: RRF分数 = {rrf_score:.4f}")
+        futures = {name: self.executor.submit(timed, name, leg) for name, leg in legs.items()}
+        pending = set(futures)
+        dropped = set()
+        while pending:
+            if self.retriever_timeout is None:
+                wait([futures[name] for name in pending])
+                break
+            # 只有已开始执行的检索才有截止时间，全部仍在排队时按一个超时周期轮询
+            deadlines = [started[name] + self.retriever_timeout for name in pending if name in started]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else self.retriever_timeout
+            wait([futures[name] for name in pending], timeout=timeout, return_when=FIRST_COMPLETED)
 
-        # 按最终RRF分数排序
-        sorted_docs = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
+            now = time.monotonic()
+            for name in list(pending):
+                if futures[name].done():
+                    pending.discard(name)
+                elif name in started and now - started[name] >= self.retriever_timeout:
+                    # 线程无法被中断，只放弃等待它的结果
+                    pending.discard(name)
+                    dropped.add(name)
 
-        # 构建最终结果
-        reranked_docs = []
-        for doc_id, final_score in sorted_docs:
-            if doc_id in doc_objects:
-                doc = doc_objects[doc_id]
-                # 将RRF分数添加到文档元数据中
-                doc.metadata['rrf_score'] = final_score
-                reranked_docs.append(doc)
-                logger.debug(f"最终排序 - 文档: {doc.page_content[:50]}... 最终RRF分数: {final_score:.4f}")
+        results = []
+        for name, future in futures.items():
+            if name in dropped:
+                self.dropped_legs[name] += 1
+                logger.warning(f"{name}检索超过 {self.retriever_timeout} 秒未完成，本次查询丢弃该路结果")
+                results.append([])
+            else:
+                results.append(future.result())
+        return results
 
-        logger.info(f"RRF重排完成: 向量检索{len(vector_docs)}个文档, BM25检索{len(bm25_docs)}个文档, 合并后{len(reranked_docs)}个文档")
+    def embed_query(self, query: str) -> List[float]:
+        """
+        获取查询向量，优先从LRU缓存读取
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            查询向量
+        """
+        def compute():
+            embedding_function = self.vectorstore.embedding_function
+            if isinstance(embedding_function, Embeddings):
+                return embedding_function.embed_query(query)
+            return embedding_function(query)
+
+        return self.query_embedding_cache.get_or_compute(query, compute)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        批量获取查询向量 - 缓存未命中的查询合并为一次前向计算
+
+        Args:
+            queries: 查询文本列表
+
+        Returns:
+            形状为(len(queries), dim)的查询向量矩阵
+        """
+        vectors = [self.query_embedding_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        if missing:
+            embedding_function = self.vectorstore.embedding_function
+            if isinstance(embedding_function, Embeddings):
+                # 当前嵌入模型的查询和文档使用相同的编码参数，embed_documents 即批量的 embed_query
+                missing_vectors = embedding_function.embed_documents(missing)
+            else:
+                missing_vectors = [embedding_function(query) for query in missing]
+            computed = dict(zip(missing, missing_vectors))
+            for query, vector in computed.items():
+                self.query_embedding_cache.put(query, vector)
+            vectors = [vector if vector is not None else computed[query] for query, vector in zip(queries, vectors)]
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _vector_search_batch(self, queries: List[str], k: int) -> List[List[Tuple[int, float]]]:
+        """
+        批量向量检索 - 一次矩阵搜索得到所有查询的结果
+
+        Args:
+            queries: 查询文本列表
+            k: 每个查询返回的结果数量
+
+        Returns:
+            与queries顺序一致的 (chunk位置, 分数) 列表
+        """
+        k = min(k, len(self.chunk_ids))
+        if k <= 0:
+            return [[] for _ in queries]
+        distances, ids = self.vectorstore.index.search(self.embed_queries(queries), k)
+        return [
+            [(int(i), -float(d)) for i, d in zip(row_ids, row_distances) if i >= 0]
+            for row_ids, row_distances in zip(ids, distances)
+        ]
+
+    def _vector_search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        向量检索 - 查询向量经过缓存后直接在FAISS中搜索
+
+        Args:
+            query: 查询文本
+            k: 返回结果数量
+            allowed: 预过滤得到的chunk位置，为None时在全部chunk中检索
+
+        Returns:
+            按相似度降序的 (chunk位置, 分数) 列表，分数为负的L2距离
+        """
+        query_vector = np.asarray([self.embed_query(query)], dtype=np.float32)
+        if allowed is not None:
+            return self._prefiltered_vector_search(query_vector, k, allowed)
+
+        k = min(k, len(self.chunk_ids))
+        if k <= 0:
+            return []
+        distances, ids = self.vectorstore.index.search(query_vector, k)
+        return [(int(i), -float(d)) for i, d in zip(ids[0], distances[0]) if i >= 0]
+
+    def _prefiltered_vector_search(self, query_vector: np.ndarray, k: int,
+                                   allowed: np.ndarray) -> List[Tuple[int, float]]:
+        """
+        在候选集合内做向量检索 - 集合较小时取出其向量精确计算距离，否则通过IDSelector让FAISS只访问集合内的向量
+
+        Args:
+            query_vector: 形状为(1, dim)的查询向量
+            k: 返回结果数量
+            allowed: 升序排列的chunk位置(即FAISS中的向量ID)
+
+        Returns:
+            按距离升序的 (chunk位置, 分数) 列表，分数为负的L2距离
+        """
+        k = min(k, len(allowed))
+        if k <= 0:
+            return []
+        index = self.vectorstore.index
+
+        if len(allowed) <= self.prefilter_bruteforce_limit:
+            try:
+                vectors = index.reconstruct_batch(allowed)
+            except RuntimeError:
+                # IVF类索引未建立直接映射时无法取回原始向量
+                vectors = None
+            if vectors is not None:
+                distances = ((vectors - query_vector) ** 2).sum(axis=1)
+                top = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+                top = top[np.argsort(distances[top], kind='stable')]
+                return [(int(allowed[i]), -float(distances[i])) for i in top]
+
+        ids = np.ascontiguousarray(allowed, dtype=np.int64)
+        selector = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+        distances, ids = index.search(query_vector, k, params=self._search_params(index, selector))
+        return [(int(i), -float(d)) for i, d in zip(ids[0], distances[0]) if i >= 0]
+
+    @staticmethod
+    def _search_params(index: "faiss.Index", selector: "faiss.IDSelector") -> "faiss.SearchParameters":
+        """构造带ID过滤器的搜索参数，保留索引当前的efSearch/nprobe设置"""
+        if isinstance(index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = index.hnsw.efSearch
+        else:
+            try:
+                ivf_index = faiss.extract_index_ivf(index)
+                params = faiss.SearchParametersIVF()
+                params.nprobe = ivf_index.nprobe
+            except RuntimeError:
+                params = faiss.SearchParameters()
+        params.sel = selector
+        return params
+
+    def _bm25_search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        BM25检索
+
+        Args:
+            query: 查询文本
+            k: 返回结果数量
+            allowed: 预过滤得到的chunk位置，为None时在全部chunk中检索
+
+        Returns:
+            按BM25分数降序的 (chunk位置, 分数) 列表
+        """
+        mask = self.metadata_index.to_mask(allowed) if allowed is not None else None
+        return self.bm25_index.search(query, k, allowed=mask)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取检索相关缓存的统计信息
+
+        Returns:
+            统计信息字典
+        """
+        stats = {
+            'query_embedding_cache': self.query_embedding_cache.get_stats()
+        }
+        if self.reranker is not None:
+            stats['rerank'] = self.reranker.get_stats()
+        return stats
+
+    def metadata_filtered_search(self, query: str, filters: Dict[str, Any], top_k: int = 5) -> List[Document]:
+        """
+        带元数据过滤的检索
+        
+        Args:
+            query: 查询文本
+            filters: 元数据过滤条件
+            top_k: 返回结果数量
+            
+        Returns:
+            过滤后的文档列表
+        """
+        # 过滤字段都已建立元数据索引时，先圈定候选集合再检索
+        allowed = self.metadata_index.allowed_positions(filters) if self.metadata_index else None
+        if allowed is not None:
+            if not len(allowed):
+                return []
+            fused = self._fused_search(query, top_k, allowed=allowed)
+            return [doc for doc, _ in self._to_documents(self._select(query, fused, top_k))]
+
+        # 否则先进行混合检索，候选深度按过滤条件放大，再应用元数据过滤
+        candidates = self._fused_search(query, top_k, filtered=True)
+
+        # 应用元数据过滤(需要重排序时保留全部通过过滤的候选交给重排序器挑选，启用多样化时保留与_select相同的候选深度)
+        if self.reranker is not None:
+            limit = len(candidates)
+        elif self.enable_diversity:
+            limit = top_k * self.diversity_candidate_factor
+        else:
+            limit = top_k
+        filtered = []
+        for chunk_id, score in candidates:
+            doc = self.chunks[self.chunk_positions[chunk_id]]
+            match = True
+            for key, value in filters.items():
+                # 去重归并的副本的分类/父文档/标题同样参与匹配
+                doc_values = metadata_values(doc.metadata, key)
+                if doc_values:
+                    wanted = value if isinstance(value, list) else [value]
+                    if not any(doc_value in wanted for doc_value in doc_values):
+                        match = False
+                        break
+                else:
+                    match = False
+                    break
+            
+            if match:
+                filtered.append((chunk_id, score))
+                if len(filtered) >= limit:
+                    break
 
-        return reranked_docs
\ No newline at end of file
+        return [doc for doc, _ in self._to_documents(self._select(query, filtered, top_k))]